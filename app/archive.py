@@ -0,0 +1,92 @@
+import csv
+import gzip
+import json
+import logging
+import os
+from pathlib import Path
+from .database import DB_PATH, ORDER_KEYS, ORDER_SELECT, get_conn, order_from_row
+from .metrics import timed_query
+
+logger = logging.getLogger(__name__)
+
+# أرشفة الطلبات المغلقة إلى ملفات JSONL مضغوطة (ملف لكل دفعة) وحذفها من الجدول في نفس المعاملة،
+# حتى يبقى جدول orders صغيرًا والتقارير تقرأ من الأرشيف لا من القاعدة
+ARCHIVE_DIR = Path(os.getenv("ARCHIVE_DIR") or DB_PATH.parent / "archive")
+BATCH_SIZE = 500
+CLOSED_STATUSES = ("done", "canceled", "expired")
+
+
+def _segment_name(orders) -> str:
+    days = sorted(o["created_at"][:10].replace("-", "") for o in orders)
+    return f"orders-{days[0]}-{days[-1]}-{orders[0]['id']:010d}.jsonl.gz"
+
+def _write_segment(orders) -> Path:
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    path = ARCHIVE_DIR / _segment_name(orders)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as gz:
+            for o in orders:
+                gz.write(json.dumps(o, ensure_ascii=False).encode() + b"\n")
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp, path)
+    return path
+
+@timed_query
+def archive_batch(max_age_days: float, limit: int = BATCH_SIZE) -> int:
+    # الملف يُكتب ويُثبَّت على القرص قبل COMMIT للحذف؛ إن فشل الحذف يُحذف الملف
+    # فلا يضيع طلب، وفي أسوأ الأحوال (انهيار بين الخطوتين) يتكرر في ملف لاحق
+    conn = get_conn()
+    conn.execute("BEGIN IMMEDIATE")
+    path = None
+    try:
+        rows = conn.execute(
+            f"{ORDER_SELECT} WHERE status IN ({','.join('?' * len(CLOSED_STATUSES))}) "
+            "AND COALESCE(updated_at, created_at) < datetime('now', ?) LIMIT ?",
+            (*CLOSED_STATUSES, f"-{max_age_days} days", limit)
+        ).fetchall()
+        if not rows:
+            conn.rollback()
+            return 0
+        orders = sorted((order_from_row(r) for r in rows), key=lambda o: o["id"])
+        path = _write_segment(orders)
+        conn.executemany("DELETE FROM orders WHERE id=?", [(o["id"],) for o in orders])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        if path is not None:
+            path.unlink(missing_ok=True)
+        raise
+    return len(orders)
+
+def _segments(start: str = None, end: str = None):
+    # التواريخ في اسم الملف تسمح بتخطي الملفات خارج المدى دون فتحها
+    lo = start.replace("-", "") if start else None
+    hi = end.replace("-", "") if end else None
+    for path in sorted(ARCHIVE_DIR.glob("orders-*.jsonl.gz")):
+        _, first_day, last_day, _ = path.name.split(".")[0].split("-")
+        if (hi and first_day > hi) or (lo and last_day < lo):
+            continue
+        yield path
+
+def iter_archived(start: str = None, end: str = None):
+    # start/end بصيغة YYYY-MM-DD (شاملة)؛ القراءة سطرًا بسطر دون تحميل الملفات في الذاكرة
+    for path in _segments(start, end):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                order = json.loads(line)
+                day = order["created_at"][:10]
+                if (start and day < start) or (end and day > end):
+                    continue
+                yield order
+
+def export_csv(dest: Path, start: str = None, end: str = None) -> int:
+    count = 0
+    with gzip.open(dest, "wt", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=ORDER_KEYS)
+        writer.writeheader()
+        for order in iter_archived(start, end):
+            writer.writerow(order)
+            count += 1
+    return count
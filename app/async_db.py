@@ -0,0 +1,96 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from . import database, storage, order_cache
+
+# Thread واحد مخصص لقاعدة البيانات: عمليات القرص لا توقف حلقة الأحداث،
+# والكتابات تُنفَّذ بالتسلسل على نفس الاتصال الدائم
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db")
+
+
+async def run(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+def _wrap(fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await run(fn, *args, **kwargs)
+    return wrapper
+
+
+ping = _wrap(database.ping)
+add_visitor = _wrap(database.add_visitor)
+add_visitors = _wrap(database.add_visitors)
+count_visitors = _wrap(database.count_visitors)
+add_order = _wrap(database.add_order)
+count_orders_by_status = _wrap(database.count_orders_by_status)
+count_pending_orders = _wrap(database.count_pending_orders)
+find_orders_by_proof = _wrap(database.find_orders_by_proof)
+page_orders = _wrap(storage.page_orders)
+list_pending_orders = _wrap(database.list_pending_orders)
+queue_snapshot = _wrap(database.queue_snapshot)
+claim_reminders = _wrap(database.claim_reminders)
+load_counters = _wrap(database.load_counters)
+add_subscriber = _wrap(database.add_subscriber)
+add_subscribers = _wrap(database.add_subscribers)
+get_subscribers = _wrap(database.get_subscribers)
+get_subscribers_after = _wrap(database.get_subscribers_after)
+count_subscribers = _wrap(database.count_subscribers)
+mark_broadcast_sent = _wrap(database.mark_broadcast_sent)
+remove_subscriber = _wrap(database.remove_subscriber)
+get_media_file_id = _wrap(database.get_media_file_id)
+set_media_file_id = _wrap(database.set_media_file_id)
+delete_media_file_id = _wrap(database.delete_media_file_id)
+create_broadcast = _wrap(database.create_broadcast)
+get_broadcast = _wrap(database.get_broadcast)
+get_running_broadcasts = _wrap(database.get_running_broadcasts)
+set_broadcast_report = _wrap(database.set_broadcast_report)
+save_broadcast_batch = _wrap(database.save_broadcast_batch)
+finish_broadcast = _wrap(database.finish_broadcast)
+
+
+# الطلبات: القراءة عبر كاش order_cache وكل كتابة ناجحة تُحدّثه (write-through)
+async def get_order(order_id: int):
+    order = order_cache.get(order_id)
+    if order is None:
+        order = await run(database.get_order, order_id)
+        if order:
+            order_cache.put(order_id, order)
+    return order
+
+async def update_order(order_id: int, **kwargs) -> bool:
+    updated = await run(database.update_order, order_id, **kwargs)
+    if updated:
+        order_cache.apply(order_id, kwargs)
+    return updated
+
+async def transition_order(order_id: int, from_status: str, to_status: str, **kwargs) -> bool:
+    moved = await run(database.transition_order, order_id, from_status, to_status, **kwargs)
+    if moved:
+        order_cache.apply(order_id, {"status": to_status, **kwargs})
+    else:
+        # الحالة في القاعدة تغيرت (عملية أخرى أو انتهاء صلاحية): النسخة المخزنة قديمة
+        order_cache.invalidate(order_id)
+    return moved
+
+async def claim_team_send(order_id: int) -> bool:
+    claimed = await run(database.claim_team_send, order_id)
+    if claimed:
+        order_cache.apply(order_id, {"team_msg_id": 0})
+    else:
+        order_cache.invalidate(order_id)
+    return claimed
+
+async def expire_pending_orders(max_age_hours: float) -> int:
+    expired = await run(database.expire_pending_orders, max_age_hours)
+    if expired:
+        order_cache.clear()
+    return expired
+
+
+def shutdown():
+    # إغلاق اتصال Thread قاعدة البيانات ثم إيقافه
+    _executor.submit(database.close_conn)
+    _executor.shutdown(wait=True)
@@ -1,41 +1,140 @@
-import re
+import asyncio
+import io
 from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, ContextTypes, filters
-from .config import BOT_TOKEN, MERCHANT_ID
-from .utils import generate_activation_code
+from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, ContextTypes, filters
+from .config import BOT_TOKEN, MERCHANT_ID, BOT_API_URL, PING_PORT, FAST_START, CUSTOMER_FLOW, UPDATE_CONCURRENCY
+from . import async_db, replies, writebehind, broadcast, outbox, media, health, maintenance, order_browser, serials, dedup, ingress
+from .request import InstrumentedRequest
+from .persistence import SQLitePersistence
+from .updates import ChatOrderedProcessor
 
-UUID_REGEX = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+async def _warm_up(app: Application):
+    await media.warm(["qr.png"])
+    # مع عدة عمليات: الاستئناف في العملية الأساسية فقط
+    if app.bot_data.get("primary", True):
+        await broadcast.resume_broadcasts(app)
 
-def build_app():
-    app = Application.builder().token(BOT_TOKEN).build()
+async def _post_init(app: Application):
+    outbox.start(app)
+    # مسارات الصحة في كل عملية على منفذها (PING_PORT + رقم العملية)
+    health.start(app, PING_PORT + app.bot_data.get("worker", 0))
+    if FAST_START:
+        # لا ننتظر التسخين: أول تحديث بعد الخمول لا يقف خلفه
+        app.create_task(_warm_up(app))
+    else:
+        await _warm_up(app)
+
+async def _post_stop(app: Application):
+    # إرسال ما تبقى في الطابور وتفريغ الكتابات المؤجلة ما دام عميل Bot API مفتوحًا (قبل shutdown)
+    await health.stop()
+    await broadcast.stop()
+    await outbox.stop()
+    await writebehind.flush()
+
+async def _post_shutdown(app: Application):
+    # بعد حفظ الجلسات في shutdown: إيقاف Thread قاعدة البيانات
+    async_db.shutdown()
+
+def build_app(primary: bool = True, customer_flow: bool = CUSTOMER_FLOW, worker: int = 0):
+    builder = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .request(InstrumentedRequest(connection_pool_size=256))
+        .get_updates_request(InstrumentedRequest())
+        .persistence(SQLitePersistence())
+        # بدونها يعالج PTB تحديثًا واحدًا في كل مرة
+        .concurrent_updates(ChatOrderedProcessor(UPDATE_CONCURRENCY, per_message_chats=[MERCHANT_ID]))
+        .post_init(_post_init)
+        .post_stop(_post_stop)
+        .post_shutdown(_post_shutdown)
+    )
+    if BOT_API_URL:
+        builder = builder.base_url(f"{BOT_API_URL}/bot").base_file_url(f"{BOT_API_URL}/file/bot")
+    app = builder.build()
+    app.bot_data["primary"] = primary
+    app.bot_data["worker"] = worker
+    # المهام الدورية (تفريغ الكتابات، WAL، انتهاء الطلبات، ملخص التاجر…)؛ المهام المفردة في العملية الأساسية فقط
+    maintenance.setup(app, primary)
+    dedup.register(app)
+    ingress.register(app)
+
+    if customer_flow:
+        # أول معالج مطابق في المجموعة يفوز: مسار العميل قبل أوامر التاجر، ورسائل التاجر مستثناة منه
+        from . import handlers
+        handlers.register(app)
 
     async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user = update.effective_user
         if not user or user.id != MERCHANT_ID:
-            await update.message.reply_text("❌ هذا البوت مخصص للتاجر فقط.")
+            await update.message.reply_text(replies.text("merchant_only"))
             return
         await update.message.reply_text("✅ أرسل النص الذي يحتوي الرمز التسلسلي (UUID).")
 
     app.add_handler(CommandHandler("start", start))
 
-    async def serial_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def broadcast_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user = update.effective_user
         if not user or user.id != MERCHANT_ID:
-            await update.message.reply_text("❌ هذا البوت مخصص للتاجر فقط.")
             return
+        text = (update.message.text or "").partition(" ")[2].strip()
+        if not text:
+            await update.message.reply_text("✍️ الاستخدام: /broadcast نص الرسالة")
+            return
+        broadcast_id = await broadcast.start_broadcast(context.bot, text, update.effective_chat.id)
+        broadcast.launch(context.bot, await async_db.get_broadcast(broadcast_id))
 
-        text = (update.message.text or "").strip()
-        match = UUID_REGEX.search(text)
-        if not match:
-            await update.message.reply_text("⚠️ لم يتم العثور على رمز تسلسلي صالح في النص.")
+    app.add_handler(CommandHandler("broadcast", broadcast_cmd))
+
+    async def throttle_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        user = update.effective_user
+        if not user or user.id != MERCHANT_ID:
             return
+        stats = ingress.stats()
+        top = "\n".join(replies.text("throttle_line", user_id=uid, count=n) for uid, n in stats.pop("top")) or "-"
+        await update.message.reply_text(replies.text("throttle_stats", top=top, **stats))
+
+    app.add_handler(CommandHandler("throttle", throttle_cmd))
+
+    # تصفح الطلبات بترقيم Keyset في رسالة واحدة تُعدَّل عند التنقل
+    app.add_handler(CommandHandler("orders", order_browser.orders_cmd))
+    app.add_handler(CommandHandler("order", order_browser.order_cmd))
+    app.add_handler(CommandHandler("queue", order_browser.queue_cmd))
+    app.add_handler(CallbackQueryHandler(order_browser.browse_callback, pattern=r"^ob:"))
+    app.add_handler(CommandHandler("export", order_browser.export_cmd))
 
-        device_id = match.group(0)
-        code = generate_activation_code(device_id)
+    async def reply_codes(message, codes: dict):
+        if not codes:
+            await message.reply_text(replies.text("serial_not_found"))
+            return
+        body = serials.render_codes(codes)
+        if len(body) <= serials.MESSAGE_LIMIT:
+            # إرسال الكود فقط بدون أي نص إضافي
+            await message.reply_text(body)
+            return
+        await message.reply_document(
+            io.BytesIO(body.encode()), filename="codes.txt", caption=replies.text("serial_codes_file", count=len(codes))
+        )
 
-        # إرسال الكود فقط بدون أي نص إضافي
-        await update.message.reply_text(code)
+    async def serial_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        user = update.effective_user
+        if not user or user.id != MERCHANT_ID:
+            await update.message.reply_text(replies.text("merchant_only"))
+            return
+        # رسالة واحدة قد تحوي عدة رموز: تُستخرج كلها دون تكرار وتُرد في رسالة واحدة
+        await reply_codes(update.message, serials.unique_codes([update.message.text or ""]))
 
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, serial_handler))
 
+    async def serial_file_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        user = update.effective_user
+        if not user or user.id != MERCHANT_ID:
+            return
+        tg_file = await update.message.document.get_file()
+        data = await tg_file.download_as_bytearray()
+        # الملفات الكبيرة تُمسح على أجزاء خارج حلقة الأحداث
+        codes = await asyncio.to_thread(serials.codes_from_bytes, bytes(data))
+        await reply_codes(update.message, codes)
+
+    app.add_handler(MessageHandler(filters.Document.Category("text/"), serial_file_handler))
+
     return app
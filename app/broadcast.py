@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import time
+from telegram.error import Forbidden, RetryAfter, TelegramError
+from . import async_db as db
+from .ratelimit import TokenBucket, KeyedLimiter
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+GLOBAL_RATE = 25        # أقل قليلًا من حد تيليغرام العام (~30 رسالة/ثانية)
+PER_CHAT_RATE = 1       # رسالة واحدة في الثانية لكل محادثة
+MAX_RETRIES = 3
+REPORT_INTERVAL = 5     # ثوانٍ بين تحديثات رسالة التقدم
+
+# مهام الإرسال الجارية: خارج Application.create_task لأن Application.stop ينتظر مهامه حتى النهاية،
+# وتُلغى عند الإيقاف ثم تُستأنف من آخر دفعة محفوظة بعد إعادة التشغيل
+_tasks = set()
+
+
+class BroadcastStats:
+    def __init__(self, sent: int = 0, failed: int = 0, total: int = 0):
+        self.sent = sent
+        self.failed = failed
+        self.total = total
+        self.started = time.monotonic()
+        self.done_this_run = 0
+
+    def rate(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.done_this_run / elapsed if elapsed > 0 else 0.0
+
+    def eta(self) -> float:
+        remaining = max(0, self.total - self.sent - self.failed)
+        rate = self.rate()
+        return remaining / rate if rate > 0 else 0.0
+
+    def render(self, finished: bool = False) -> str:
+        head = "✅ انتهى الإرسال الجماعي" if finished else "📣 جارٍ الإرسال الجماعي..."
+        return (
+            f"{head}\n"
+            f"📤 تم الإرسال: {self.sent}/{self.total}\n"
+            f"⚠️ فشل: {self.failed}\n"
+            f"⚡ السرعة: {self.rate():.1f} رسالة/ثانية\n"
+            f"⏱️ المتبقي: {int(self.eta())} ثانية"
+        )
+
+
+def _seconds(value) -> float:
+    return value.total_seconds() if hasattr(value, "total_seconds") else float(value)
+
+
+async def _send_one(bot, chat_id: int, text: str, global_bucket: TokenBucket, per_chat: KeyedLimiter) -> bool:
+    for _ in range(MAX_RETRIES + 1):
+        await global_bucket.acquire()
+        await per_chat.acquire(chat_id)
+        try:
+            await bot.send_message(chat_id=chat_id, text=text)
+            return True
+        except RetryAfter as e:
+            # حد عام من تيليغرام: إيقاف كل المرسلين ثم إعادة المحاولة
+            wait = _seconds(e.retry_after)
+            # الدلو المعاقَب يؤخر المحاولة التالية (وكل المرسلين) بمقدار wait
+            global_bucket.penalize(wait)
+        except Forbidden:
+            # المستخدم حظر البوت
+            await db.remove_subscriber(chat_id)
+            return False
+        except TelegramError as e:
+            logger.warning(f"Broadcast to {chat_id} failed: {e}")
+            return False
+    return False
+
+
+async def run_broadcast(bot, broadcast_id: int, report=None) -> BroadcastStats:
+    # report: دالة async تستقبل (stats, finished) لعرض التقدم
+    b = await db.get_broadcast(broadcast_id)
+    stats = BroadcastStats(b["sent"], b["failed"], await db.count_subscribers(fresh=True))
+    global_bucket = TokenBucket(GLOBAL_RATE)
+    per_chat = KeyedLimiter(PER_CHAT_RATE, max_keys=BATCH_SIZE * 4)
+    after = b["last_user_id"]
+    last_report = 0.0
+
+    while True:
+        batch = await db.get_subscribers_after(after, BATCH_SIZE)
+        if not batch:
+            break
+        results = await asyncio.gather(
+            *(_send_one(bot, uid, b["text"], global_bucket, per_chat) for uid in batch)
+        )
+        sent_ids = [uid for uid, ok in zip(batch, results) if ok]
+        stats.sent += len(sent_ids)
+        stats.failed += len(batch) - len(sent_ids)
+        stats.done_this_run += len(batch)
+        after = batch[-1]
+        # نقطة استئناف بعد كل دفعة
+        await db.save_broadcast_batch(broadcast_id, sent_ids, after, stats.sent, stats.failed)
+
+        if report and time.monotonic() - last_report >= REPORT_INTERVAL:
+            last_report = time.monotonic()
+            await report(stats, False)
+
+    await db.finish_broadcast(broadcast_id)
+    if report:
+        await report(stats, True)
+    logger.info(f"Broadcast #{broadcast_id} finished: sent={stats.sent} failed={stats.failed}")
+    return stats
+
+
+def message_reporter(bot, broadcast: dict):
+    # تعديل رسالة التقدم نفسها لدى التاجر بدل إرسال رسائل جديدة
+    async def report(stats: BroadcastStats, finished: bool):
+        if not broadcast.get("report_msg_id"):
+            return
+        try:
+            await bot.edit_message_text(
+                chat_id=broadcast["report_chat_id"],
+                message_id=broadcast["report_msg_id"],
+                text=stats.render(finished)
+            )
+        except TelegramError as e:
+            logger.warning(f"Broadcast progress update failed: {e}")
+    return report
+
+
+async def start_broadcast(bot, text: str, report_chat_id: int) -> int:
+    broadcast_id = await db.create_broadcast(text, report_chat_id)
+    msg = await bot.send_message(chat_id=report_chat_id, text=f"📣 بدء الإرسال الجماعي #{broadcast_id}...")
+    await db.set_broadcast_report(broadcast_id, report_chat_id, msg.message_id)
+    return broadcast_id
+
+
+def launch(bot, broadcast: dict):
+    task = asyncio.create_task(run_broadcast(bot, broadcast["id"], message_reporter(bot, broadcast)))
+    _tasks.add(task)
+    task.add_done_callback(_done)
+    return task
+
+def _done(task):
+    _tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        logger.error(f"Broadcast task failed: {task.exception()!r}")
+
+async def stop():
+    # الإيقاف لا ينتظر بقية المشتركين؛ الدفعة الجارية قد تُرسل مرة ثانية عند الاستئناف
+    for task in list(_tasks):
+        task.cancel()
+    if _tasks:
+        await asyncio.gather(*_tasks, return_exceptions=True)
+        logger.info("Broadcasts paused, will resume after restart")
+
+async def resume_broadcasts(app):
+    # استئناف أي إرسال لم يكتمل قبل إعادة التشغيل
+    for broadcast_id in await db.get_running_broadcasts():
+        b = await db.get_broadcast(broadcast_id)
+        logger.info(f"Resuming broadcast #{broadcast_id} after user {b['last_user_id']}")
+        launch(app.bot, b)
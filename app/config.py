@@ -1,7 +1,12 @@
 import os
-from dotenv import load_dotenv
+from pathlib import Path
 
-load_dotenv()
+# تُقرأ الإعدادات مرة واحدة هنا؛ ملف .env من جذر المشروع إن وُجد فقط
+# (على الخادم تأتي المتغيرات من البيئة فلا تُستورد dotenv أصلًا)
+ENV_PATH = Path(__file__).resolve().parent.parent / ".env"
+if ENV_PATH.exists():
+    from dotenv import load_dotenv
+    load_dotenv(dotenv_path=ENV_PATH)
 
 BOT_TOKEN = os.getenv("BOT_TOKEN", "").strip()
 BOT_USERNAME = os.getenv("BOT_USERNAME", "").strip()
@@ -18,3 +23,26 @@ MERCHANT_QR = os.getenv("MERCHANT_QR", "").strip()
 
 USE_POLLING = os.getenv("USE_POLLING", "0").strip() == "1"
 PUBLIC_URL = os.getenv("PUBLIC_URL", "").strip()
+# تسجيل مسار العميل (app/handlers.py) قبل أوامر التاجر في build_app
+CUSTOMER_FLOW = os.getenv("CUSTOMER_FLOW", "0").strip() == "1"
+# أقصى عدد تحديثات تُعالج معًا في العملية الواحدة (بالترتيب داخل كل محادثة)
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "64").strip() or 1)
+PORT = int(os.getenv("PORT", "5000").strip() or 5000)
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "1").strip() or 1)
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "").strip()
+# تشغيل سريع: تسخين الكاش واستئناف الإرسال الجماعي في الخلفية بدل انتظارهما قبل استقبال التحديثات
+FAST_START = os.getenv("FAST_START", "0").strip() == "1"
+# عنوان بديل لـ Bot API (مثلاً خادم محلي للاختبار)، فارغ = api.telegram.org
+BOT_API_URL = os.getenv("BOT_API_URL", "").strip()
+# منفذ مسارات الصحة (/ping و /ready)
+PING_PORT = int(os.getenv("PING_PORT", "8080").strip() or 8080)
+# حد التحديثات لكل مستخدم (دلو رموز): معدل/ثانية وأقصى دفعة، والحد الأقصى للطلبات المعلقة لكل مستخدم
+INGRESS_RATE = float(os.getenv("INGRESS_RATE", "1").strip() or 1)
+INGRESS_BURST = float(os.getenv("INGRESS_BURST", "8").strip() or 8)
+MAX_PENDING_ORDERS = int(os.getenv("MAX_PENDING_ORDERS", "3").strip() or 0)
+# الطلبات المعلقة الأقدم من هذه المدة (بالساعات) تُعلَّم expired، صفر = تعطيل
+ORDER_TTL_HOURS = float(os.getenv("ORDER_TTL_HOURS", "48").strip() or 0)
+# الطلبات المغلقة الأقدم من هذه المدة (بالأيام) تُنقل إلى ملفات الأرشيف، صفر = تعطيل
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "30").strip() or 0)
+# وعد زمن الرد للعملاء (بالثواني): /queue يقيس نسبة التفعيل ضمنه، والتذكيرات تتصاعد عند 1× و5× و15× منه، صفر = تعطيل التذكيرات
+SLA_SECONDS = float(os.getenv("SLA_SECONDS", "60").strip() or 0)
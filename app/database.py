@@ -1,138 +1,383 @@
+import os
 import sqlite3
+import threading
 from pathlib import Path
+from .migrations import migrate
+from .metrics import timed_query
 
-# استخدم فولدر /data إذا كان موجود (مثلاً عند النقل لاحقًا إلى Fly.io)، وإلا ملف محلي
-DB_PATH = Path("/data/bot.db") if Path("/data").exists() else Path("bot.db")
+# مسار واحد لقاعدة البيانات لكل الوحدات (database/db/storage):
+# DB_PATH من البيئة، أو فولدر /data إذا كان موجود (مثلاً على Fly.io)، وإلا bot.db في جذر المشروع
+BASE_DIR = Path(__file__).resolve().parent.parent
+DB_PATH = Path(os.getenv("DB_PATH") or (Path("/data/bot.db") if Path("/data").exists() else BASE_DIR / "bot.db"))
 
+# اتصال دائم لكل Thread بدل فتح اتصال جديد مع كل استعلام
+_local = threading.local()
 
+# عدادات في الذاكرة تُقرأ مرة عند التشغيل وتُحدَّث عند كل إدراج فعلي
+_counters = {"visitors": 0, "subscribers": 0}
+
+
+def get_conn() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        # cached_statements: إعادة استخدام الاستعلامات المُحضّرة (نفس نص SQL)
+        conn = sqlite3.connect(DB_PATH, timeout=30, cached_statements=256)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA cache_size=-8000")  # ~8MB
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA foreign_keys=ON")
+        _local.conn = conn
+    return conn
+
+
+def close_conn():
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
+@timed_query
+def ping() -> bool:
+    return get_conn().execute("SELECT 1").fetchone()[0] == 1
+
+@timed_query
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    # جدول الطلبات
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS orders (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            device_id TEXT,
-            notify_msg TEXT,
-            proof_file_id TEXT,
-            activation_code TEXT,
-            status TEXT DEFAULT 'pending',
-            team_msg_id INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    # جدول الزوار
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS visitors (
-            user_id INTEGER PRIMARY KEY,
-            first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    # جدول المشتركين في الإشعارات
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS subscribers (
-            user_id INTEGER PRIMARY KEY,
-            first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_broadcast TIMESTAMP
-        )
-    """)
-    conn.commit()
-    conn.close()
+    migrate(get_conn())
+    load_counters()
+
+@timed_query
+def load_counters():
+    for name, value in get_conn().execute("SELECT name, value FROM counters"):
+        if name in _counters:
+            _counters[name] = value
 
+@timed_query
+def read_counter(name: str) -> int:
+    # قراءة مباشرة من جدول counters (بحث بالمفتاح الأساسي)، صحيحة عبر كل العمليات
+    row = get_conn().execute("SELECT value FROM counters WHERE name=?", (name,)).fetchone()
+    if row:
+        _counters[name] = row[0]
+    return _counters.get(name, 0)
+
+@timed_query
 def add_visitor(user_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("INSERT OR IGNORE INTO visitors (user_id) VALUES (?)", (user_id,))
-    conn.commit()
-    conn.close()
-
-def count_visitors() -> int:
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) FROM visitors")
-    count = cur.fetchone()[0]
-    conn.close()
-    return count
-
-def add_order(user_id: int, device_id: str, notify_msg: str = None) -> int:
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO orders (user_id, device_id, notify_msg, status) VALUES (?, ?, ?, 'pending')",
-        (user_id, device_id, notify_msg)
-    )
-    conn.commit()
-    oid = cur.lastrowid
-    conn.close()
-    return oid
+    conn = get_conn()
+    with conn:
+        cur = conn.execute("INSERT OR IGNORE INTO visitors (user_id) VALUES (?)", (user_id,))
+    _counters["visitors"] += cur.rowcount
+
+@timed_query
+def add_visitors(user_ids) -> int:
+    # إدراج دفعة واحدة؛ يعيد عدد الصفوف الجديدة فعلاً
+    conn = get_conn()
+    with conn:
+        cur = conn.executemany("INSERT OR IGNORE INTO visitors (user_id) VALUES (?)", [(u,) for u in user_ids])
+    _counters["visitors"] += cur.rowcount
+    return cur.rowcount
 
-def update_order(order_id: int, **kwargs):
+@timed_query
+def count_visitors(fresh: bool = False) -> int:
+    # fresh=True يقرأ من جدول counters بدل النسخة المحلية
+    return read_counter("visitors") if fresh else _counters["visitors"]
+
+@timed_query
+def add_order(user_id: int, device_id: str, notify_msg: str = None, max_pending: int = None):
+    # max_pending: رفض الطلب (None) إذا كان للمستخدم هذا العدد من الطلبات المعلقة؛
+    # العدّ والإدراج في جملة واحدة فلا سباق بين طلبين متزامنين
+    conn = get_conn()
+    with conn:
+        if max_pending:
+            cur = conn.execute(
+                "INSERT INTO orders (user_id, device_id, notify_msg, status) SELECT ?, ?, ?, 'pending' "
+                "WHERE (SELECT COUNT(*) FROM orders WHERE user_id=? AND status='pending') < ?",
+                (user_id, device_id, notify_msg, user_id, max_pending)
+            )
+            if not cur.rowcount:
+                return None
+        else:
+            cur = conn.execute(
+                "INSERT INTO orders (user_id, device_id, notify_msg, status) VALUES (?, ?, ?, 'pending')",
+                (user_id, device_id, notify_msg)
+            )
+    return cur.lastrowid
+
+@timed_query
+def update_order(order_id: int, **kwargs) -> bool:
     if not kwargs:
-        return
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
+        return False
+    conn = get_conn()
     fields = ", ".join([f"{k}=?" for k in kwargs.keys()])
     values = list(kwargs.values())
     values.append(order_id)
-    cur.execute(f"UPDATE orders SET {fields} WHERE id=?", values)
-    conn.commit()
-    conn.close()
+    with conn:
+        cur = conn.execute(f"UPDATE orders SET {fields}, updated_at=CURRENT_TIMESTAMP WHERE id=?", values)
+    return cur.rowcount > 0
+
+@timed_query
+def transition_order(order_id: int, from_status: str, to_status: str, **kwargs) -> bool:
+    # انتقال شرطي: ينجح مرة واحدة فقط مهما تكرر الضغط أو وصل التحديث أكثر من مرة
+    fields = "".join(f", {k}=?" for k in kwargs)
+    conn = get_conn()
+    with conn:
+        cur = conn.execute(
+            f"UPDATE orders SET status=?{fields}, updated_at=CURRENT_TIMESTAMP WHERE id=? AND status=?",
+            (to_status, *kwargs.values(), order_id, from_status)
+        )
+    return cur.rowcount > 0
+
+@timed_query
+def claim_team_send(order_id: int) -> bool:
+    # حجز إرسال الطلب للتاجر مرة واحدة: team_msg_id=0 حتى يصل رقم الرسالة الفعلي
+    conn = get_conn()
+    with conn:
+        cur = conn.execute(
+            "UPDATE orders SET team_msg_id=0 WHERE id=? AND status='pending' AND team_msg_id IS NULL", (order_id,)
+        )
+    return cur.rowcount > 0
+
+# جدول طلبات واحد لمسار التفعيل (kind='activation') ومسار الدفع (kind='payment')
+ORDER_KEYS = [
+    "id","kind","user_id","device_id","notify_msg","proof_file_id","proof_unique_id","proof_kind","activation_code",
+    "to_phone","amount","fee","note","status","team_msg_id","created_at","updated_at"
+]
+ORDER_SELECT = f"SELECT {','.join(ORDER_KEYS)} FROM orders"
 
+def order_from_row(row):
+    return dict(zip(ORDER_KEYS, row)) if row else None
+
+@timed_query
 def get_order(order_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT id,user_id,device_id,notify_msg,proof_file_id,activation_code,status,team_msg_id,created_at
-        FROM orders WHERE id=?
-    """, (order_id,))
-    row = cur.fetchone()
-    conn.close()
-    if not row:
-        return None
-    keys = ["id","user_id","device_id","notify_msg","proof_file_id","activation_code","status","team_msg_id","created_at"]
-    return dict(zip(keys, row))
+    return order_from_row(get_conn().execute(f"{ORDER_SELECT} WHERE id=?", (order_id,)).fetchone())
+
+@timed_query
+def find_orders_by_proof(proof_unique_id: str, exclude_id: int = None, limit: int = 5):
+    # نفس صورة الإشعار في طلبات أخرى (بحث في الفهرس idx_orders_proof_unique_id)
+    rows = get_conn().execute(
+        "SELECT id FROM orders WHERE proof_unique_id=? AND id != ? ORDER BY id DESC LIMIT ?",
+        (proof_unique_id, exclude_id or 0, limit)
+    ).fetchall()
+    return [r[0] for r in rows]
+
+@timed_query
+def count_pending_orders() -> int:
+    # عداد pending_orders يحدّثه الـ Trigger مع كل تغيير حالة (الترحيل 7)
+    return read_counter("pending_orders")
+
+@timed_query
+def queue_snapshot():
+    # كلفة ثابتة مهما طال الطابور: عداد بالمفتاح، أقدم طلب ببحث واحد في الفهرس (status, created_at)،
+    # وصفوف خانات زمن التفعيل (عددها ثابت)
+    conn = get_conn()
+    oldest = conn.execute(
+        "SELECT (julianday('now') - julianday(MIN(created_at))) * 86400 FROM orders WHERE status='pending'"
+    ).fetchone()[0]
+    return {
+        "pending": read_counter("pending_orders"),
+        "oldest_seconds": oldest,
+        "histogram": conn.execute("SELECT le, count FROM activation_histogram ORDER BY le").fetchall(),
+    }
+
+@timed_query
+def claim_reminders(level: int, older_than_seconds: float, limit: int = 20):
+    # الطلبات المعلقة التي تجاوزت العمر ولم يصلها تذكير بهذا المستوى، الأقدم أولًا عبر الفهرس (status, created_at)
+    conn = get_conn()
+    with conn:
+        rows = conn.execute(
+            f"{ORDER_SELECT} WHERE status='pending' AND created_at < datetime('now', ?) AND reminder_level < ? "
+            "ORDER BY created_at LIMIT ?",
+            (f"-{int(older_than_seconds)} seconds", level, limit)
+        ).fetchall()
+        conn.executemany("UPDATE orders SET reminder_level=? WHERE id=?", [(level, r[0]) for r in rows])
+    return [order_from_row(r) for r in rows]
+
+@timed_query
+def list_pending_orders(limit: int = 10):
+    # الأقدم أولًا عبر الفهرس (status, id)
+    rows = get_conn().execute(f"{ORDER_SELECT} WHERE status='pending' ORDER BY id LIMIT ?", (limit,)).fetchall()
+    return [order_from_row(r) for r in rows]
+
+@timed_query
+def expire_pending_orders(max_age_hours: float) -> int:
+    conn = get_conn()
+    with conn:
+        cur = conn.execute(
+            "UPDATE orders SET status='expired', updated_at=CURRENT_TIMESTAMP "
+            "WHERE status='pending' AND created_at < datetime('now', ?)",
+            (f"-{max_age_hours} hours",)
+        )
+    return cur.rowcount
+
+@timed_query
+def checkpoint():
+    # دمج WAL في الملف الرئيسي بدون انتظار القرّاء؛ إحصاءات المخطط تحدّثها analyze()
+    return get_conn().execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+
+# عدد الصفوف المفحوصة لكل فهرس في ANALYZE: كلفة ثابتة تقريبًا مهما كبرت الجداول
+ANALYZE_LIMIT = 1000
+
+@timed_query
+def analyze(conn: sqlite3.Connection = None):
+    # تحديث إحصاءات المخطط (sqlite_stat1) بعد نمو الجداول؛ إحصاءات قديمة من قاعدة صغيرة
+    # تجعل المخطط يفضّل مسح فهرس كامل على البحث في المفتاح الأساسي (مثلًا ترقيم المشتركين)
+    conn = conn or get_conn()
+    conn.execute(f"PRAGMA analysis_limit={ANALYZE_LIMIT}")
+    conn.execute("ANALYZE")
+    conn.commit()
+
+@timed_query
+def count_orders_by_status():
+    # عبر الفهرس idx_orders_status_id فقط؛ يُستدعى عند قراءة /metrics
+    return dict(get_conn().execute("SELECT status, COUNT(*) FROM orders GROUP BY status").fetchall())
 
 # إدارة المشتركين (للإرسال الجماعي)
+@timed_query
 def add_subscriber(user_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("INSERT OR IGNORE INTO subscribers (user_id) VALUES (?)", (user_id,))
-    conn.commit()
-    conn.close()
+    conn = get_conn()
+    with conn:
+        cur = conn.execute("INSERT OR IGNORE INTO subscribers (user_id) VALUES (?)", (user_id,))
+    _counters["subscribers"] += cur.rowcount
 
+@timed_query
+def add_subscribers(user_ids) -> int:
+    conn = get_conn()
+    with conn:
+        cur = conn.executemany("INSERT OR IGNORE INTO subscribers (user_id) VALUES (?)", [(u,) for u in user_ids])
+    _counters["subscribers"] += cur.rowcount
+    return cur.rowcount
+
+@timed_query
 def get_subscribers(limit: int = None, offset: int = 0):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
+    conn = get_conn()
     q = "SELECT user_id FROM subscribers ORDER BY first_seen ASC"
     if limit is not None:
         q += " LIMIT ? OFFSET ?"
-        cur.execute(q, (limit, offset))
+        rows = conn.execute(q, (limit, offset)).fetchall()
     else:
-        cur.execute(q)
-    rows = cur.fetchall()
-    conn.close()
+        rows = conn.execute(q).fetchall()
+    return [r[0] for r in rows]
+
+@timed_query
+def get_subscribers_after(after_user_id: int, limit: int):
+    # ترقيم بالمفتاح (keyset) بدل OFFSET: كل دفعة بحث واحد في المفتاح الأساسي
+    rows = get_conn().execute(
+        "SELECT user_id FROM subscribers WHERE user_id > ? ORDER BY user_id LIMIT ?",
+        (after_user_id, limit)
+    ).fetchall()
     return [r[0] for r in rows]
 
-def count_subscribers() -> int:
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) FROM subscribers")
-    count = cur.fetchone()[0]
-    conn.close()
-    return count
+@timed_query
+def count_subscribers(fresh: bool = False) -> int:
+    return read_counter("subscribers") if fresh else _counters["subscribers"]
 
+@timed_query
 def mark_broadcast_sent(user_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("UPDATE subscribers SET last_broadcast=CURRENT_TIMESTAMP WHERE user_id=?", (user_id,))
-    conn.commit()
-    conn.close()
+    conn = get_conn()
+    with conn:
+        conn.execute("UPDATE subscribers SET last_broadcast=CURRENT_TIMESTAMP WHERE user_id=?", (user_id,))
+
+# جلسات المحادثة (user_data)
+@timed_query
+def load_sessions(since: float):
+    return get_conn().execute(
+        "SELECT user_id, data, updated_at FROM sessions WHERE updated_at >= ?", (since,)
+    ).fetchall()
+
+@timed_query
+def get_session_if_newer(user_id: int, version: float):
+    return get_conn().execute(
+        "SELECT data, updated_at FROM sessions WHERE user_id=? AND updated_at > ?", (user_id, version)
+    ).fetchone()
+
+@timed_query
+def save_sessions(rows, deleted_ids=()):
+    # rows: [(user_id, data_json, updated_at)] في معاملة واحدة
+    conn = get_conn()
+    with conn:
+        if rows:
+            conn.executemany("INSERT OR REPLACE INTO sessions (user_id, data, updated_at) VALUES (?, ?, ?)", rows)
+        if deleted_ids:
+            conn.executemany("DELETE FROM sessions WHERE user_id=?", [(u,) for u in deleted_ids])
+
+@timed_query
+def delete_sessions_before(cutoff: float) -> int:
+    conn = get_conn()
+    with conn:
+        cur = conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,))
+    return cur.rowcount
 
+# ذاكرة الوسائط
+@timed_query
+def get_media_file_id(sha256: str):
+    row = get_conn().execute("SELECT file_id FROM media_cache WHERE sha256=?", (sha256,)).fetchone()
+    return row[0] if row else None
+
+@timed_query
+def set_media_file_id(sha256: str, file_id: str):
+    conn = get_conn()
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO media_cache (sha256, file_id) VALUES (?, ?)", (sha256, file_id))
+
+@timed_query
+def delete_media_file_id(sha256: str):
+    conn = get_conn()
+    with conn:
+        conn.execute("DELETE FROM media_cache WHERE sha256=?", (sha256,))
+
+# الإرسال الجماعي
+BROADCAST_KEYS = ["id","text","status","last_user_id","sent","failed","report_chat_id","report_msg_id","created_at","finished_at"]
+
+@timed_query
+def create_broadcast(text: str, report_chat_id: int = None) -> int:
+    conn = get_conn()
+    with conn:
+        cur = conn.execute("INSERT INTO broadcasts (text, report_chat_id) VALUES (?, ?)", (text, report_chat_id))
+    return cur.lastrowid
+
+@timed_query
+def get_broadcast(broadcast_id: int):
+    row = get_conn().execute(
+        f"SELECT {','.join(BROADCAST_KEYS)} FROM broadcasts WHERE id=?", (broadcast_id,)
+    ).fetchone()
+    return dict(zip(BROADCAST_KEYS, row)) if row else None
+
+@timed_query
+def get_running_broadcasts():
+    rows = get_conn().execute("SELECT id FROM broadcasts WHERE status='running' ORDER BY id").fetchall()
+    return [r[0] for r in rows]
+
+@timed_query
+def set_broadcast_report(broadcast_id: int, chat_id: int, msg_id: int):
+    conn = get_conn()
+    with conn:
+        conn.execute("UPDATE broadcasts SET report_chat_id=?, report_msg_id=? WHERE id=?", (chat_id, msg_id, broadcast_id))
+
+@timed_query
+def save_broadcast_batch(broadcast_id: int, sent_ids, last_user_id: int, sent: int, failed: int):
+    # تسجيل last_broadcast للدفعة كاملة ونقطة الاستئناف في معاملة واحدة
+    conn = get_conn()
+    with conn:
+        conn.executemany(
+            "UPDATE subscribers SET last_broadcast=CURRENT_TIMESTAMP WHERE user_id=?", [(u,) for u in sent_ids]
+        )
+        conn.execute(
+            "UPDATE broadcasts SET last_user_id=?, sent=?, failed=? WHERE id=?",
+            (last_user_id, sent, failed, broadcast_id)
+        )
+
+@timed_query
+def finish_broadcast(broadcast_id: int, status: str = "done"):
+    conn = get_conn()
+    with conn:
+        conn.execute(
+            "UPDATE broadcasts SET status=?, finished_at=CURRENT_TIMESTAMP WHERE id=?", (status, broadcast_id)
+        )
+
+@timed_query
 def remove_subscriber(user_id: int):
     # يمكن استخدامها لاحقًا إذا رغبت بإلغاء الاشتراك
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("DELETE FROM subscribers WHERE user_id=?", (user_id,))
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    conn = get_conn()
+    with conn:
+        cur = conn.execute("DELETE FROM subscribers WHERE user_id=?", (user_id,))
+    _counters["subscribers"] -= cur.rowcount
@@ -0,0 +1,29 @@
+from collections import OrderedDict
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, TypeHandler
+from .metrics import DUPLICATES
+
+# إسقاط التحديثات المكررة (إعادة إرسال Webhook من تيليجرام) قبل أي معالج أو استدعاء API.
+# التوجيه حسب المحادثة في وضع العمليات المتعددة يضمن وصول التكرار لنفس العملية
+MAX_RECENT = 10_000
+
+_recent = OrderedDict()
+
+
+def seen(update_id: int) -> bool:
+    if update_id in _recent:
+        _recent.move_to_end(update_id)
+        return True
+    _recent[update_id] = None
+    if len(_recent) > MAX_RECENT:
+        _recent.popitem(last=False)
+    return False
+
+async def drop_duplicates(update: Update, context):
+    if seen(update.update_id):
+        DUPLICATES.inc("update")
+        raise ApplicationHandlerStop
+
+def register(app):
+    # المجموعة -2 تُنفذ قبل كل المعالجات الأخرى (وقبل حد التحديثات في -1)
+    app.add_handler(TypeHandler(Update, drop_duplicates), group=-2)
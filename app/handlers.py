@@ -1,223 +1,249 @@
+import asyncio
 import logging
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ContextTypes
-from .database import (
-    add_order, update_order, get_order,
-    add_visitor, count_visitors, add_subscriber
-)
-from .utils import generate_activation_code, final_report
-from .config import MERCHANT_ID
+import os
+from telegram import Update
+from telegram.ext import CallbackQueryHandler, CommandHandler, ContextTypes, MessageHandler, filters
+from . import async_db as db
+from . import database
+from . import writebehind
+from . import outbox
+from . import media
+from . import proof_store
+from . import ingress
+from .metrics import timed_handler, DUPLICATES
+from . import replies
+from .replies import team_keyboard, new_order_keyboard, send_team_keyboard
+from .utils import final_report
+from .serials import activation_code
+from .config import MERCHANT_ID, MAX_PENDING_ORDERS
 
 logger = logging.getLogger(__name__)
 
-# أزرار
-def team_keyboard(order_id: int):
-    return InlineKeyboardMarkup([
-        [InlineKeyboardButton("🔑 إرسال كود التفعيل", callback_data=f"activate:{order_id}")],
-        [InlineKeyboardButton("❌ إلغاء الطلب", callback_data=f"cancel:{order_id}")]
-    ])
-
-def new_order_keyboard():
-    return InlineKeyboardMarkup([[InlineKeyboardButton("🔄 طلب جديد", callback_data="new_order")]])
-
-def send_team_keyboard(order_id: int):
-    return InlineKeyboardMarkup([
-        [InlineKeyboardButton("📤 إرسال", callback_data=f"send_team:{order_id}")]
-    ])
+# إشعارات الزوار تُجمع في ملخص دوري مع الإجمالي الحالي
+outbox.set_digest_footer("visitors", lambda: replies.text("visitors_total", total=database.count_visitors()))
 
 # بدء البوت
+@timed_handler
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     context.user_data.clear()
 
     if user:
-        try:
-            add_visitor(user.id)
-            add_subscriber(user.id)
-        except Exception as e:
-            logger.warning(f"Visitor/subscriber insert failed: {e}")
+        writebehind.note_visitor(user.id)
+        writebehind.note_subscriber(user.id)
 
-    total = count_visitors()
+    lang = replies.lang_of(user)
+    await update.message.reply_text(replies.text("preparing", lang))
 
-    await update.message.reply_text("⏳ جارٍ تجهيز الخدمة... يرجى الانتظار لحظات.")
-
-    # إشعار التاجر بفتح البوت
-    try:
-        await context.bot.send_message(
-            chat_id=MERCHANT_ID,
-            text=(
-                f"📢 إشعار جديد:\n"
-                f"👤 زائر جديد: {user.full_name if user else '-'} (ID: {user.id if user else '-'})\n"
-                f"📊 إجمالي الزوار الآن: {total}"
-            )
-        )
-    except Exception as e:
-        logger.warning(f"Failed to notify merchant: {e}")
+    # إشعار التاجر بفتح البوت (يُرسل من طابور الإرسال ويُدمج مع غيره عند الضغط)
+    outbox.add_digest_line(
+        MERCHANT_ID, "visitors",
+        replies.text("visitor_line", name=user.full_name if user else '-', user_id=user.id if user else '-')
+    )
 
     # إرسال تعليمات + صورة
     try:
-        await update.message.reply_photo(
-            photo=open("qr.png", "rb"),
-            caption=(
-                "⚠️ تنويه هام\n"
-                "قد يتأخر رد البوت أحيانًا لمدّة لا تتجاوز دقيقة واحدة نتيجة الضغط.\n\n"
-                "في حال تأخر أكثر من ذلك، أرسل رمز النسخة الكاملة عبر واتساب من داخل التطبيق.\n\n"
-                "طرق الدفع:\n"
-                "1) الشام كاش:\n"
-                "- امسح باركود الحساب في الأعلى أو استخدم العنوان:\n"
-                "`ce95cda303cc0c382736307089e2ddeb`\n\n"
-                "2) سيريتل كاش:\n"
-                "- تحويل كاش يدوي إلى الرقم: `0997625546` (ليس تعبئة وحدات).\n\n"
-                "الخطوة التالية:\n"
-                "- انسخ رمز النسخة الكاملة من التطبيق، ثم الصقه هنا وأرسله.\n"
-            )
-        )
+        await media.reply_cached_photo(update.message, "qr.png", caption=replies.text("start_caption", lang))
     except FileNotFoundError:
-        await update.message.reply_text(
-            "⚠️ لم يتم العثور على صورة QR (qr.png). اكمل الخطوات دون الصورة.\n"
-            "أرسل رمز النسخة الكاملة هنا للمتابعة."
-        )
+        await update.message.reply_text(replies.text("qr_missing", lang))
 
 # إحصائيات الزوار (للتاجر فقط)
+@timed_handler
 async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     if not user or user.id != MERCHANT_ID:
         return
-    total = count_visitors()
-    await update.message.reply_text(f"📊 عدد الزوار الذين ضغطوا Start: {total}")
+    total = await db.count_visitors(fresh=True)
+    await update.message.reply_text(replies.text("visitor_count", total=total))
 
 # استقبال النصوص
+@timed_handler
 async def text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     text = (update.message.text or "").strip()
 
     if user:
-        add_subscriber(user.id)
+        writebehind.note_subscriber(user.id)
 
     # الخطوة 1: Device ID
     if "device_id" not in context.user_data:
         context.user_data["device_id"] = text
-        await update.message.reply_text("📸 أرسل الآن صورة إشعار الدفع (لقطة شاشة) أو نص إشعار الدفع أو رقم العملية.")
+        await update.message.reply_text(replies.text("ask_proof", replies.lang_of(user)))
         return
 
     # الخطوة 2: إشعار الدفع كنص
     if "notify_msg" not in context.user_data:
+        lang = replies.lang_of(user)
+        order_id = await db.add_order(user.id, context.user_data["device_id"], text, max_pending=MAX_PENDING_ORDERS)
+        if not order_id:
+            ingress.note("orders", user.id)
+            await update.message.reply_text(replies.text("too_many_pending", lang))
+            return
         context.user_data["notify_msg"] = text
-        order_id = add_order(user.id, context.user_data["device_id"], text)
         context.user_data["order_id"] = order_id
 
         await update.message.reply_text(
-            "✅ ممتاز.\n"
-            "اضغط إرسال لاستلام بيانات الدفع الخاصة بك.",
-            reply_markup=send_team_keyboard(order_id)
+            replies.text("press_send", lang),
+            reply_markup=send_team_keyboard(order_id, lang)
         )
         return
 
 # استقبال صورة إشعار الدفع
+@timed_handler
 async def proof_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     if user:
-        add_subscriber(user.id)
+        writebehind.note_subscriber(user.id)
 
     order_id = context.user_data.get("order_id")
 
-    file_id = None
+    file_id = unique_id = None
     if update.message.photo:
-        file_id = update.message.photo[-1].file_id
+        photo = update.message.photo[-1]
+        file_id, unique_id, kind, suffix = photo.file_id, photo.file_unique_id, "photo", ".jpg"
     elif update.message.document:
-        file_id = update.message.document.file_id
+        document = update.message.document
+        file_id, unique_id, kind = document.file_id, document.file_unique_id, "document"
+        suffix = os.path.splitext(document.file_name or "")[1] or ".bin"
 
     if not order_id:
-        order_id = add_order(user.id, context.user_data.get("device_id", "-"), "صورة إشعار")
+        order_id = await db.add_order(
+            user.id, context.user_data.get("device_id", "-"), "صورة إشعار", max_pending=MAX_PENDING_ORDERS
+        )
+        if not order_id:
+            ingress.note("orders", user.id)
+            await update.message.reply_text(replies.text("too_many_pending", replies.lang_of(user)))
+            return
         context.user_data["order_id"] = order_id
 
-    if file_id:
-        update_order(order_id, proof_file_id=file_id)
+    # نفس الصورة أُعيد إرسالها لنفس الطلب: لا كتابة ولا تنزيل جديد
+    if file_id and context.user_data.get("proof_unique_id") != unique_id:
+        await db.update_order(order_id, proof_file_id=file_id, proof_unique_id=unique_id, proof_kind=kind)
+        context.user_data["proof_unique_id"] = unique_id
+        context.application.create_task(proof_store.save(context.bot, file_id, unique_id, suffix))
 
+    lang = replies.lang_of(user)
     await update.message.reply_text(
-        "✅ ممتاز.\n"
-        "اضغط إرسال لاستلام بيانات الدفع الخاصة بك.",
-        reply_markup=send_team_keyboard(order_id)
+        replies.text("press_send", lang),
+        reply_markup=send_team_keyboard(order_id, lang)
     )
 
+async def _delete_quietly(call, label: str):
+    try:
+        await call
+    except Exception as e:
+        logger.warning(f"Delete {label} message failed: {e}")
+
+async def _already_handled(query, action: str):
+    # ضغط مزدوج أو تحديث مكرر: لا رسائل جديدة، فقط إغلاق مؤشر التحميل على الزر
+    DUPLICATES.inc(action)
+    await query.answer(replies.text("order_already_handled"))
+
 # أزرار فريق العمل
+@timed_handler
 async def team_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
-    await query.answer()
     parts = query.data.split(":")
     action = parts[0]
     order_id = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else None
 
     if action == "new_order":
+        await query.answer()
         context.user_data.clear()
-        await query.message.reply_text("📱 أدخل رمز النسخة الكاملة الخاصة بجهازك (انسخه من التطبيق ثم الصقه هنا).")
+        await query.message.reply_text(replies.text("ask_device", replies.lang_of(query.from_user)))
         return
 
-    order = get_order(order_id) if order_id else None
+    order = await db.get_order(order_id) if order_id else None
     if not order:
-        await query.message.reply_text("❌ الطلب غير موجود.")
+        await query.answer()
+        await query.message.reply_text(replies.text("order_not_found"))
         return
 
     # إرسال الطلب للتاجر
     if action == "send_team":
-        msg = await context.bot.send_message(
-            chat_id=MERCHANT_ID,
-            text=(
-                f"🟦 طلب جديد #{order_id}\n"
-                f"🔢 رقم الجهاز: {order['device_id']}\n"
-                f"🧾 إشعار: {order['notify_msg'] or '-'}\n"
-                f"📌 الحالة: {order.get('status','pending')}"
-            ),
-            reply_markup=team_keyboard(order_id)
+        if not await db.claim_team_send(order_id):
+            await _already_handled(query, action)
+            return
+        await query.answer()
+
+        async def save_team_msg(msg):
+            await db.update_order(order_id, team_msg_id=msg.message_id)
+
+        notice = replies.text(
+            "new_order", order_id=order_id, device_id=order['device_id'],
+            notify_msg=order['notify_msg'] or '-', status=order.get('status','pending')
         )
+        # نفس صورة الإشعار في طلبات سابقة (file_unique_id ثابت لنفس الملف)
+        if order.get("proof_unique_id"):
+            reused = await db.find_orders_by_proof(order["proof_unique_id"], order_id)
+            if reused:
+                notice += "\n" + replies.text("proof_reused", orders=", ".join(f"#{i}" for i in reused))
+        outbox.enqueue(MERCHANT_ID, notice, reply_markup=team_keyboard(order_id), on_sent=save_team_msg)
         if order.get("proof_file_id"):
-            await context.bot.send_photo(
-                chat_id=MERCHANT_ID,
-                photo=order["proof_file_id"],
-                caption=f"🖼️ صورة إشعار الدفع لطلب #{order_id}"
+            # صور عدة طلبات متقاربة تصل للتاجر كألبوم واحد
+            outbox.add_album_item(
+                MERCHANT_ID, order.get("proof_kind") or "photo", order["proof_file_id"],
+                caption=replies.text("proof_caption", order_id=order_id)
             )
 
-        update_order(order_id, team_msg_id=msg.message_id)
-
-        await query.message.reply_text("📤 تم إرسال طلبك لفريق العمل ✅", reply_markup=new_order_keyboard())
+        lang = replies.lang_of(query.from_user)
+        await query.message.reply_text(replies.text("sent_to_team", lang), reply_markup=new_order_keyboard(lang))
         context.user_data.clear()
         return
 
     # فريق العمل: إرسال كود التفعيل
     if action == "activate":
-        code = generate_activation_code(order["device_id"])
-        update_order(order_id, activation_code=code, status="done")
-
-        await context.bot.send_message(
-            chat_id=order["user_id"],
-            text=f"🔑 كود التفعيل الخاص بجهازك: {code}"
-        )
-
-        report = final_report(order_id, get_order(order_id))
-        await context.bot.send_message(chat_id=MERCHANT_ID, text=f"📊 تقرير نهائي:\n{report}")
-        await context.bot.send_message(chat_id=order["user_id"], text=f"📊 تقرير طلبك:\n{report}", reply_markup=new_order_keyboard())
+        code = activation_code(order["device_id"])
+        if not await db.transition_order(order_id, "pending", "done", activation_code=code):
+            await _already_handled(query, action)
+            return
+        await query.answer()
+
+        # التقرير من النسخة المخزنة بعد الانتقال (بدون قراءة ثانية من القاعدة)
+        report = final_report(order_id, await db.get_order(order_id))
+        outbox.enqueue(MERCHANT_ID, replies.text("final_report_merchant", report=report))
+
+        async def notify_customer():
+            # الكود ثم التقرير بالترتيب؛ الحذف مستقل عنهما فيُنفذ بالتوازي
+            await context.bot.send_message(
+                chat_id=order["user_id"],
+                text=replies.text("activation_code", code=code)
+            )
+            await context.bot.send_message(
+                chat_id=order["user_id"],
+                text=replies.text("final_report_user", report=report),
+                reply_markup=new_order_keyboard()
+            )
 
+        calls = [notify_customer(), _delete_quietly(query.message.delete(), "query")]
         if order.get("team_msg_id"):
-            try:
-                await context.bot.delete_message(chat_id=MERCHANT_ID, message_id=order["team_msg_id"])
-            except Exception as e:
-                logger.warning(f"Delete team message failed: {e}")
-        try:
-            await query.message.delete()
-        except Exception as e:
-            logger.warning(f"Delete query message failed: {e}")
+            calls.append(_delete_quietly(
+                context.bot.delete_message(chat_id=MERCHANT_ID, message_id=order["team_msg_id"]), "team"
+            ))
+        await asyncio.gather(*calls)
         return
 
     # فريق العمل: إلغاء الطلب
     if action == "cancel":
-        update_order(order_id, status="canceled")
+        if not await db.transition_order(order_id, "pending", "canceled"):
+            await _already_handled(query, action)
+            return
+        await query.answer()
         await context.bot.send_message(
             chat_id=order["user_id"],
-            text="❌ تم إلغاء طلبك.",
+            text=replies.text("order_canceled"),
             reply_markup=new_order_keyboard()
         )
-        await context.bot.send_message(
-            chat_id=MERCHANT_ID,
-            text=f"❌ تم إلغاء الطلب #{order_id} من قبل فريق العمل."
-        )
+        outbox.enqueue(MERCHANT_ID, replies.text("order_canceled_merchant", order_id=order_id))
         return
+
+
+def register(app):
+    # مسار العميل كاملًا (start ← رمز الجهاز ← الإشعار ← الإرسال للتاجر ← التفعيل)
+    # رسائل التاجر (/start، الرموز التسلسلية، ملفات .txt) تمر إلى معالجات التاجر في bot.py
+    customers = ~filters.User(MERCHANT_ID)
+    app.add_handler(CommandHandler("start", start, filters=customers))
+    app.add_handler(CommandHandler("stats", stats))
+    app.add_handler(MessageHandler(customers & (filters.PHOTO | filters.Document.ALL), proof_handler))
+    app.add_handler(MessageHandler(customers & filters.TEXT & ~filters.COMMAND, text_handler))
+    app.add_handler(CallbackQueryHandler(team_action, pattern=r"^(new_order|send_team|activate|cancel)"))
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import logging
+import time
+from tornado.httpserver import HTTPServer
+from tornado.web import Application as WebApplication, RequestHandler
+from . import async_db, metrics, outbox, writebehind
+
+logger = logging.getLogger(__name__)
+
+# مسارات الصحة تُخدم من حلقة أحداث البوت نفسها: إذا علقت الحلقة لا يصل أي رد.
+# /ready يعكس الحالة الفعلية: تأخر الحلقة، الوصول لقاعدة البيانات، وطول طوابير التحديثات
+LAG_INTERVAL = 0.5
+LAG_LIMIT = 1.0         # ثوانٍ
+QUEUE_LIMIT = 1000
+DB_TIMEOUT = 2
+
+_state = {"lag": 0.0, "max_lag": 0.0}
+_tasks = []
+_server = None
+
+
+async def _lag_monitor():
+    while True:
+        t0 = time.monotonic()
+        await asyncio.sleep(LAG_INTERVAL)
+        lag = max(0.0, time.monotonic() - t0 - LAG_INTERVAL)
+        _state["lag"] = lag
+        _state["max_lag"] = max(_state["max_lag"], lag)
+
+def loop_lag() -> float:
+    return _state["lag"]
+
+metrics.Gauge("bot_event_loop_lag_seconds", "Event loop lag (last sample)", callback=loop_lag)
+metrics.Gauge("bot_outbox_depth", "Queued outbound notifications", callback=outbox.queue_depth)
+metrics.Gauge("bot_pending_writes", "Buffered visitor/subscriber inserts", callback=writebehind.pending_count)
+
+def update_backlog(app) -> int:
+    # مع المعالجة المتزامنة يسحب PTB التحديثات من update_queue فورًا ويحوّلها لمهام؛
+    # المتراكم الفعلي هو ما ينتظر قفل محادثته أو مكانًا في ChatOrderedProcessor
+    backlog = getattr(app.update_processor, "backlog", None)
+    return app.update_queue.qsize() + (backlog() if backlog else 0)
+
+async def readiness(app):
+    try:
+        db_ok = await asyncio.wait_for(async_db.ping(), DB_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Readiness DB check failed: {e}")
+        db_ok = False
+    state = {
+        "worker": app.bot_data.get("worker", 0),
+        "db": db_ok,
+        "loop_lag_ms": round(_state["lag"] * 1000, 1),
+        "max_loop_lag_ms": round(_state["max_lag"] * 1000, 1),
+        "update_backlog": update_backlog(app),
+        "outbox": outbox.queue_depth(),
+        "pending_writes": writebehind.pending_count(),
+    }
+    _state["max_lag"] = 0.0
+    ready = db_ok and _state["lag"] < LAG_LIMIT and state["update_backlog"] < QUEUE_LIMIT
+    return ready, state
+
+
+class HomeHandler(RequestHandler):
+    def get(self):
+        self.write("Service OK")
+
+class PingHandler(RequestHandler):
+    def get(self):
+        self.write("I am alive!")
+
+class ReadyHandler(RequestHandler):
+    def initialize(self, app):
+        self.app = app
+
+    async def get(self):
+        ready, state = await readiness(self.app)
+        self.set_status(200 if ready else 503)
+        self.set_header("Content-Type", "application/json")
+        self.write(json.dumps({"ready": ready, **state}))
+
+
+class MetricsHandler(RequestHandler):
+    async def get(self):
+        # عدد الطلبات حسب الحالة يُحسب فقط عند القراءة
+        try:
+            metrics.ORDERS.replace(await asyncio.wait_for(async_db.count_orders_by_status(), DB_TIMEOUT))
+        except Exception as e:
+            logger.warning(f"Metrics order counts failed: {e}")
+        self.set_header("Content-Type", "text/plain; version=0.0.4")
+        self.write(metrics.render())
+
+
+def routes(app):
+    return [
+        (r"/", HomeHandler),
+        (r"/ping", PingHandler),
+        (r"/ready", ReadyHandler, {"app": app}),
+        (r"/metrics", MetricsHandler),
+    ]
+
+def start(app, port: int, extra_routes=()):
+    global _server
+    _tasks.append(asyncio.get_running_loop().create_task(_lag_monitor()))
+    _server = HTTPServer(WebApplication([*routes(app), *extra_routes]))
+    _server.listen(port)
+    logger.info(f"Health endpoint listening on :{port}")
+
+async def stop():
+    global _server
+    for task in _tasks:
+        task.cancel()
+    _tasks.clear()
+    if _server:
+        _server.stop()
+        await _server.close_all_connections()
+        _server = None
@@ -0,0 +1,50 @@
+import logging
+from collections import OrderedDict
+from telegram import Update
+from telegram.error import TelegramError
+from telegram.ext import ApplicationHandlerStop, TypeHandler
+from .config import MERCHANT_ID, INGRESS_RATE, INGRESS_BURST
+from .metrics import THROTTLED
+from .ratelimit import KeyedLimiter
+from .replies import text
+
+logger = logging.getLogger(__name__)
+
+# حد التحديثات لكل مستخدم: دلو رموز لكل user_id (عدد الدلاء محدود، الأقدم استخدامًا يُحذف).
+# التحديث الزائد يُسقط قبل أي معالج، فلا كتابة في القاعدة؛ استدعاء Bot API الوحيد هو
+# الرد على ضغطة الزر حتى لا يبقى مؤشر التحميل ظاهرًا حتى انتهاء مهلة تيليغرام
+MAX_TRACKED = 10_000
+MAX_OFFENDERS = 1_000
+TOP_OFFENDERS = 10
+
+_limiter = KeyedLimiter(INGRESS_RATE, INGRESS_BURST, max_keys=MAX_TRACKED)
+_totals = {"updates": 0, "orders": 0}
+_offenders = OrderedDict()    # user_id -> عدد مرات الرفض
+
+
+def note(reason: str, user_id: int):
+    THROTTLED.inc(reason)
+    _totals[reason] = _totals.get(reason, 0) + 1
+    _offenders[user_id] = _offenders.pop(user_id, 0) + 1
+    if len(_offenders) > MAX_OFFENDERS:
+        _offenders.popitem(last=False)
+
+async def throttle(update: Update, context):
+    user = update.effective_user
+    if not user or user.id == MERCHANT_ID:
+        return
+    if not _limiter.try_acquire(user.id):
+        note("updates", user.id)
+        if update.callback_query:
+            try:
+                await update.callback_query.answer(text("throttled"))
+            except TelegramError as e:
+                logger.warning(f"Throttled callback answer failed: {e}")
+        raise ApplicationHandlerStop
+
+def stats() -> dict:
+    top = sorted(_offenders.items(), key=lambda kv: -kv[1])[:TOP_OFFENDERS]
+    return {**_totals, "tracked": len(_limiter._buckets), "top": top}
+
+def register(app):
+    app.add_handler(TypeHandler(Update, throttle), group=-1)
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import time
+from . import async_db, database, writebehind, media, outbox, sla
+from .config import MERCHANT_ID, ORDER_TTL_HOURS, ARCHIVE_AFTER_DAYS
+from .metrics import MAINTENANCE_SECONDS, MAINTENANCE_ERRORS, MAINTENANCE_SKIPPED
+from .persistence import SQLitePersistence
+from .replies import text
+
+logger = logging.getLogger(__name__)
+
+DIGEST_LIMIT = 10       # عدد الطلبات المعروضة في ملخص التاجر
+REMINDER_LIMIT = 20     # أقصى عدد طلبات في رسالة تذكير واحدة؛ الباقي في الدورة التالية
+SLOW_TASK = 1.0         # ثوانٍ؛ المهام الأبطأ تُسجَّل كتحذير
+
+
+class Task:
+    def __init__(self, name: str, fn, interval: float, jitter: float = 0, first: float = None, primary_only: bool = False):
+        self.name, self.fn, self.interval = name, fn, interval
+        self.jitter = jitter
+        self.first = interval if first is None else first
+        self.primary_only = primary_only
+
+
+async def flush_writes(app):
+    await writebehind.flush()
+
+async def checkpoint_db(app):
+    # على Thread منفصل بمقبضه الخاص كي لا يقف خلف استعلامات المعالجات في Thread قاعدة البيانات
+    busy, log_frames, done = await asyncio.to_thread(database.checkpoint)
+    if busy:
+        logger.info(f"WAL checkpoint incomplete: {done}/{log_frames} frames")
+
+async def analyze_db(app):
+    # مثل checkpoint_db: على Thread منفصل بمقبضه الخاص
+    await asyncio.to_thread(database.analyze)
+
+async def expire_orders(app):
+    if ORDER_TTL_HOURS <= 0:
+        return
+    expired = await async_db.expire_pending_orders(ORDER_TTL_HOURS)
+    if expired:
+        logger.info(f"Expired {expired} stale pending orders")
+
+async def archive_orders(app):
+    if ARCHIVE_AFTER_DAYS <= 0:
+        return
+    # استيراد متأخر: الأرشفة (gzip/csv) ليست على مسار بدء التشغيل
+    from . import archive
+    # دفعة لكل معاملة؛ بين الدفعات يعود Thread القاعدة لاستعلامات المعالجات
+    total = 0
+    while True:
+        moved = await async_db.run(archive.archive_batch, ARCHIVE_AFTER_DAYS)
+        total += moved
+        if moved < archive.BATCH_SIZE:
+            break
+    if total:
+        logger.info(f"Archived {total} closed orders")
+
+async def evict_sessions(app):
+    if isinstance(app.persistence, SQLitePersistence):
+        evicted = await app.persistence.evict_stale(app)
+        if evicted:
+            logger.info(f"Evicted {evicted} stale sessions")
+
+async def warm_caches(app):
+    # إعادة مزامنة العدادات (عمليات أخرى قد تكتب) والتأكد من بقاء file_id للصور صالحًا
+    await async_db.load_counters()
+    await media.warm(["qr.png"])
+
+async def pending_digest(app):
+    count = await async_db.count_pending_orders()
+    if not count:
+        return
+    orders = await async_db.list_pending_orders(DIGEST_LIMIT)
+    lines = "\n".join(
+        text("pending_digest_line", order_id=o["id"], device_id=o["device_id"] or "-", created_at=o["created_at"])
+        for o in orders
+    )
+    outbox.enqueue(MERCHANT_ID, text("pending_digest", count=count, lines=lines), priority=outbox.PRIORITY_NOTICE)
+
+async def sla_reminders(app):
+    # تذكير متصاعد بالطلبات التي تجاوزت وعد الرد؛ الأشد أولًا بأولوية الطلبات، الأول بأولوية الإشعارات
+    for level, age in sla.reminder_thresholds():
+        orders = await async_db.claim_reminders(level, age, REMINDER_LIMIT)
+        if not orders:
+            continue
+        lines = "\n".join(
+            text("pending_digest_line", order_id=o["id"], device_id=o["device_id"] or "-", created_at=o["created_at"])
+            for o in orders
+        )
+        message = text(f"sla_reminder_{level}", count=len(orders), age=sla.fmt_duration(age), lines=lines)
+        priority = outbox.PRIORITY_NOTICE if level == 1 else outbox.PRIORITY_ORDER
+        outbox.enqueue(MERCHANT_ID, message, priority=priority)
+
+
+TASKS = [
+    Task("flush_writes", flush_writes, writebehind.FLUSH_INTERVAL),
+    Task("evict_sessions", evict_sessions, 600, jitter=60),
+    Task("checkpoint_db", checkpoint_db, 300, jitter=30, primary_only=True),
+    Task("analyze_db", analyze_db, 3600, jitter=300, first=120, primary_only=True),
+    Task("expire_orders", expire_orders, 900, jitter=60, first=60, primary_only=True),
+    Task("archive_orders", archive_orders, 86400, jitter=600, first=300, primary_only=True),
+    Task("warm_caches", warm_caches, 3600, jitter=300),
+    Task("pending_digest", pending_digest, 3600, jitter=60, primary_only=True),
+    Task("sla_reminders", sla_reminders, 30, jitter=5, primary_only=True),
+]
+
+_running = set()
+
+
+def _job(task: Task):
+    async def run(context):
+        # حماية من التداخل: لا تبدأ دورة جديدة قبل انتهاء السابقة
+        if task.name in _running:
+            MAINTENANCE_SKIPPED.inc(task.name)
+            logger.warning(f"Maintenance task {task.name} still running, skipping")
+            return
+        _running.add(task.name)
+        t0 = time.perf_counter()
+        try:
+            await task.fn(context.application)
+        except Exception as e:
+            MAINTENANCE_ERRORS.inc(task.name)
+            logger.warning(f"Maintenance task {task.name} failed: {e}")
+        finally:
+            _running.discard(task.name)
+            elapsed = time.perf_counter() - t0
+            MAINTENANCE_SECONDS.observe(elapsed, task.name)
+            if elapsed > SLOW_TASK:
+                logger.warning(f"Maintenance task {task.name} took {elapsed:.2f}s")
+    run.__name__ = task.name
+    return run
+
+def setup(app, primary: bool = True):
+    for task in TASKS:
+        if task.primary_only and not primary:
+            continue
+        app.job_queue.run_repeating(
+            _job(task),
+            interval=task.interval,
+            first=task.first,
+            name=task.name,
+            job_kwargs={"jitter": task.jitter} if task.jitter else None,
+        )
@@ -0,0 +1,65 @@
+import hashlib
+import logging
+import os
+from telegram.error import BadRequest
+from . import async_db as db
+
+logger = logging.getLogger(__name__)
+
+# رفع الصورة مرة واحدة ثم إعادة استخدام file_id الذي يعيده تيليغرام.
+# المفتاح بصمة SHA-256 للمحتوى، فتغيير الملف يؤدي لرفعه من جديد تلقائيًا
+_digests = {}   # path -> (mtime_ns, size, sha256)
+_file_ids = {}  # sha256 -> file_id
+
+
+def file_digest(path: str) -> str:
+    st = os.stat(path)
+    cached = _digests.get(path)
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    _digests[path] = (st.st_mtime_ns, st.st_size, digest)
+    return digest
+
+async def _cached_file_id(digest: str):
+    file_id = _file_ids.get(digest)
+    if file_id is None:
+        file_id = await db.get_media_file_id(digest)
+        if file_id:
+            _file_ids[digest] = file_id
+    return file_id
+
+async def _forget(digest: str):
+    _file_ids.pop(digest, None)
+    await db.delete_media_file_id(digest)
+
+async def reply_cached_photo(message, path: str, **kwargs):
+    # يرفع FileNotFoundError إذا لم يوجد الملف
+    digest = file_digest(path)
+    file_id = await _cached_file_id(digest)
+    if file_id:
+        try:
+            return await message.reply_photo(photo=file_id, **kwargs)
+        except BadRequest as e:
+            # file_id مرفوض (انتهى أو من بوت آخر): إعادة الرفع
+            logger.warning(f"Cached file_id for {path} rejected: {e}")
+            await _forget(digest)
+
+    with open(path, "rb") as f:
+        msg = await message.reply_photo(photo=f, **kwargs)
+    if msg and msg.photo:
+        _file_ids[digest] = msg.photo[-1].file_id
+        await db.set_media_file_id(digest, _file_ids[digest])
+    return msg
+
+async def warm(paths):
+    # تحميل file_id المحفوظة مسبقًا إلى الذاكرة
+    for path in paths:
+        try:
+            await _cached_file_id(file_digest(path))
+        except FileNotFoundError:
+            pass
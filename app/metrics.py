@@ -0,0 +1,148 @@
+import bisect
+import functools
+import threading
+import time
+
+# عدادات ومدرجات تكرارية بصيغة Prometheus النصية، تُعرض على /metrics.
+# التسجيل مجرد زيادة أرقام في الذاكرة؛ النص يُبنى فقط عند الطلب
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_registry = []
+_lock = threading.Lock()
+
+
+def _fmt_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, *label_values, n: float = 1):
+        with _lock:
+            self._values[label_values] = self._values.get(label_values, 0) + n
+
+    def samples(self):
+        # نسخة تحت القفل: Thread القاعدة وعمال to_thread يضيفون سلاسل جديدة أثناء القراءة
+        with _lock:
+            items = list(self._values.items())
+        for values, v in items:
+            yield f"{self.name}{_fmt_labels(self.labels, values)} {v}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels=(), callback=None):
+        super().__init__(name, help, labels)
+        # callback: دالة تعيد القيمة (بدون تسميات) وتُستدعى عند القراءة فقط
+        self.callback = callback
+
+    def set(self, *label_values, value: float):
+        with _lock:
+            self._values[label_values] = value
+
+    def replace(self, values: dict):
+        with _lock:
+            self._values = {k if isinstance(k, tuple) else (k,): v for k, v in values.items()}
+
+    def samples(self):
+        if self.callback:
+            yield f"{self.name} {self.callback()}"
+            return
+        yield from super().samples()
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}   # label_values -> [counts per bucket + inf, sum]
+        _registry.append(self)
+
+    def observe(self, value: float, *label_values):
+        i = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def samples(self):
+        with _lock:
+            items = [(values, (list(counts), total)) for values, (counts, total) in self._series.items()]
+        for values, (counts, total) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + ("+Inf",), counts):
+                cumulative += c
+                yield f"{self.name}_bucket{_fmt_labels(self.labels, values, ('le', bound))} {cumulative}"
+            yield f"{self.name}_sum{_fmt_labels(self.labels, values)} {total}"
+            yield f"{self.name}_count{_fmt_labels(self.labels, values)} {cumulative}"
+
+
+def render() -> str:
+    lines = []
+    for m in _registry:
+        lines.append(f"# HELP {m.name} {m.help}")
+        lines.append(f"# TYPE {m.name} {m.kind}")
+        lines.extend(m.samples())
+    return "\n".join(lines) + "\n"
+
+
+HANDLER_SECONDS = Histogram("bot_handler_seconds", "Handler latency", ["handler"])
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Handler exceptions", ["handler"])
+DB_SECONDS = Histogram("bot_db_query_seconds", "Database call latency", ["query"])
+DB_ERRORS = Counter("bot_db_errors_total", "Database call errors", ["query"])
+API_SECONDS = Histogram("bot_api_seconds", "Bot API call latency", ["method"])
+API_ERRORS = Counter("bot_api_errors_total", "Bot API errors", ["method"])
+ORDERS = Gauge("bot_orders", "Orders by status", ["status"])
+CACHE = Counter("bot_cache_total", "In-memory cache lookups", ["cache", "result"])
+THROTTLED = Counter("bot_throttled_total", "Updates and orders rejected by per-user limits", ["reason"])
+DUPLICATES = Counter("bot_duplicates_total", "Dropped duplicate updates and repeated order actions", ["kind"])
+MAINTENANCE_SECONDS = Histogram("bot_maintenance_seconds", "Maintenance task duration", ["task"])
+MAINTENANCE_ERRORS = Counter("bot_maintenance_errors_total", "Maintenance task failures", ["task"])
+MAINTENANCE_SKIPPED = Counter("bot_maintenance_skipped_total", "Maintenance runs skipped while the previous run was active", ["task"])
+
+
+def timed_handler(fn):
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        except Exception:
+            HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - t0, name)
+    return wrapper
+
+def timed_query(fn):
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            DB_ERRORS.inc(name)
+            raise
+        finally:
+            DB_SECONDS.observe(time.perf_counter() - t0, name)
+    return wrapper
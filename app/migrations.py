@@ -0,0 +1,249 @@
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+# ترحيلات المخطط بالترتيب؛ رقم آخر ترحيل مُطبّق محفوظ في PRAGMA user_version.
+# لإضافة تعديل: أضف (رقم جديد, [أوامر SQL أو دوال تستقبل الاتصال]) في آخر القائمة ولا تعدّل ترحيلًا قديمًا
+COUNTED_TABLES = ("visitors", "subscribers")
+
+
+def _counter_statements():
+    statements = []
+    for table in COUNTED_TABLES:
+        statements += [
+            f"INSERT OR IGNORE INTO counters (name, value) SELECT '{table}', COUNT(*) FROM {table}",
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_count_ins AFTER INSERT ON {table}
+            BEGIN UPDATE counters SET value = value + 1 WHERE name = '{table}'; END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_count_del AFTER DELETE ON {table}
+            BEGIN UPDATE counters SET value = value - 1 WHERE name = '{table}'; END
+            """,
+        ]
+    return statements
+
+
+# حدود خانات زمن التفعيل بالثواني (من الإنشاء حتى done)؛ الأخيرة تجمع ما فوق يوم
+ACTIVATION_BUCKETS = (15, 30, 60, 120, 300, 600, 1800, 3600, 10800, 43200, 86400, 1e9)
+
+
+ORDERS_COLUMNS = """
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT DEFAULT 'activation',      -- activation | payment
+    user_id INTEGER,
+    device_id TEXT,
+    notify_msg TEXT,
+    proof_file_id TEXT,
+    activation_code TEXT,
+    to_phone TEXT,                       -- رقم المستلم (طلبات الدفع)
+    amount REAL,                         -- المبلغ
+    fee REAL DEFAULT 0,                  -- العمولة
+    note TEXT,
+    status TEXT DEFAULT 'pending',       -- pending | done | canceled
+    team_msg_id INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+"""
+
+
+def _rebuild_orders(conn):
+    # SQLite لا يسمح بتعديل قيود الأعمدة، لذا يُبنى الجدول من جديد وتُنسخ الأعمدة المشتركة
+    existing = [r[1] for r in conn.execute("PRAGMA table_info(orders)")]
+    conn.execute(f"CREATE TABLE orders_new ({ORDERS_COLUMNS})")
+    new_columns = [r[1] for r in conn.execute("PRAGMA table_info(orders_new)")]
+    common = ",".join(c for c in existing if c in new_columns)
+    if common:
+        conn.execute(f"INSERT INTO orders_new ({common}) SELECT {common} FROM orders")
+    conn.execute("DROP TABLE IF EXISTS orders")
+    conn.execute("ALTER TABLE orders_new RENAME TO orders")
+
+
+MIGRATIONS = [
+    # 1: المخطط الأساسي (IF NOT EXISTS حتى تمر القواعد الموجودة قبل نظام الترحيل)
+    (1, [
+        """
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            device_id TEXT,
+            notify_msg TEXT,
+            proof_file_id TEXT,
+            activation_code TEXT,
+            status TEXT DEFAULT 'pending',
+            team_msg_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS visitors (
+            user_id INTEGER PRIMARY KEY,
+            first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS subscribers (
+            user_id INTEGER PRIMARY KEY,
+            first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_broadcast TIMESTAMP
+        )
+        """,
+        # حالة الإرسال الجماعي (نقطة الاستئناف بعد إعادة التشغيل)
+        """
+        CREATE TABLE IF NOT EXISTS broadcasts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            text TEXT NOT NULL,
+            status TEXT DEFAULT 'running',
+            last_user_id INTEGER DEFAULT 0,
+            sent INTEGER DEFAULT 0,
+            failed INTEGER DEFAULT 0,
+            report_chat_id INTEGER,
+            report_msg_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+        """,
+        # file_id للوسائط المرفوعة مسبقًا، مفتاحه بصمة محتوى الملف
+        """
+        CREATE TABLE IF NOT EXISTS media_cache (
+            sha256 TEXT PRIMARY KEY,
+            file_id TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        # عدادات محدثة بالـ Triggers حتى تبقى صحيحة مع أكثر من عملية (process)
+        """
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        *_counter_statements(),
+    ]),
+    # 2: فهارس الاستعلامات المتكررة
+    (2, [
+        "CREATE INDEX IF NOT EXISTS idx_orders_user_id ON orders (user_id, id)",
+        "CREATE INDEX IF NOT EXISTS idx_orders_status_id ON orders (status, id)",
+        "CREATE INDEX IF NOT EXISTS idx_subscribers_first_seen ON subscribers (first_seen)",
+        "ANALYZE",
+    ]),
+    # 3: توحيد جدول orders بين مسار التفعيل (database.py) ومسار الدفع (storage.py)
+    (3, [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY,              -- Telegram user_id
+            username TEXT,
+            phone TEXT,
+            role TEXT DEFAULT 'customer',        -- customer | merchant | admin
+            is_verified INTEGER DEFAULT 0,
+            chat_id INTEGER,
+            created_at TEXT DEFAULT (datetime('now'))
+        )
+        """,
+        _rebuild_orders,
+        "UPDATE orders SET status = lower(status)",
+        "UPDATE orders SET kind = 'payment' WHERE to_phone IS NOT NULL",
+        "CREATE INDEX IF NOT EXISTS idx_orders_user_id ON orders (user_id, id)",
+        "CREATE INDEX IF NOT EXISTS idx_orders_status_id ON orders (status, id)",
+    ]),
+    # 4: حالة المحادثة (user_data) لكل مستخدم، تبقى بعد إعادة التشغيل وتشترك بها العمليات
+    (4, [
+        """
+        CREATE TABLE IF NOT EXISTS sessions (
+            user_id INTEGER PRIMARY KEY,
+            data TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions (updated_at)",
+    ]),
+    # 5: بصمة صورة الإشعار (file_unique_id) لكشف إعادة استخدامها بين الطلبات، ونوعها (photo/document)
+    (5, [
+        "ALTER TABLE orders ADD COLUMN proof_unique_id TEXT",
+        "ALTER TABLE orders ADD COLUMN proof_kind TEXT",
+        "CREATE INDEX IF NOT EXISTS idx_orders_proof_unique_id ON orders (proof_unique_id) WHERE proof_unique_id IS NOT NULL",
+    ]),
+    # 6: عدّ الطلبات المعلقة لكل مستخدم (حد الطلبات المفتوحة) من الفهرس مباشرة
+    (6, [
+        "CREATE INDEX IF NOT EXISTS idx_orders_user_status ON orders (user_id, status)",
+    ]),
+    # 7: طابور الطلبات المعلقة: أقدم طلب من الفهرس، عدد المعلّق وتوزيع زمن التفعيل محدّثان بالـ Triggers،
+    # ومستوى آخر تذكير مرسل لكل طلب
+    (7, [
+        "CREATE INDEX IF NOT EXISTS idx_orders_status_created ON orders (status, created_at)",
+        "ALTER TABLE orders ADD COLUMN reminder_level INTEGER DEFAULT 0",
+        "INSERT OR IGNORE INTO counters (name, value) SELECT 'pending_orders', COUNT(*) FROM orders WHERE status='pending'",
+        """
+        CREATE TRIGGER IF NOT EXISTS orders_pending_ins AFTER INSERT ON orders WHEN NEW.status IS 'pending'
+        BEGIN UPDATE counters SET value = value + 1 WHERE name = 'pending_orders'; END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS orders_pending_del AFTER DELETE ON orders WHEN OLD.status IS 'pending'
+        BEGIN UPDATE counters SET value = value - 1 WHERE name = 'pending_orders'; END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS orders_pending_upd AFTER UPDATE OF status ON orders
+        WHEN (OLD.status IS 'pending') != (NEW.status IS 'pending')
+        BEGIN
+            UPDATE counters SET value = value + (NEW.status IS 'pending') - (OLD.status IS 'pending')
+            WHERE name = 'pending_orders';
+        END
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS activation_histogram (
+            le REAL PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        # خانات فارغة بلا تعبئة من الطلبات القديمة: updated_at للطلبات قبل الترحيل 3 هو وقت إعادة البناء
+        # لا وقت التفعيل، فيُحسب عمر الطلب كله زمنَ تفعيل. التوزيع يبدأ من أول تفعيل بعد الترحيل
+        "INSERT OR IGNORE INTO activation_histogram (le, count) VALUES "
+        + ", ".join(f"({le}, 0)" for le in ACTIVATION_BUCKETS),
+        """
+        CREATE TRIGGER IF NOT EXISTS orders_activation_hist AFTER UPDATE OF status ON orders
+        WHEN OLD.status IS 'pending' AND NEW.status IS 'done'
+        BEGIN
+            UPDATE activation_histogram SET count = count + 1 WHERE le = (
+                SELECT MIN(le) FROM activation_histogram
+                WHERE le >= (julianday('now') - julianday(NEW.created_at)) * 86400
+            );
+        END
+        """,
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn: sqlite3.Connection, target: int = LATEST_VERSION) -> int:
+    if schema_version(conn) >= target:
+        return schema_version(conn)
+    for version, statements in MIGRATIONS:
+        if version > target:
+            break
+        # BEGIN IMMEDIATE: عملية واحدة فقط تطبّق الترحيل عند تشغيل عدة عمليات معًا
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            for step in statements:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        logger.info(f"Applied schema migration {version}")
+    return schema_version(conn)
+
+def explain(conn: sqlite3.Connection, sql: str, params=()) -> str:
+    # خطة التنفيذ كنص واحد، للتأكد من أن الاستعلام يستخدم الفهرس المتوقع
+    return "\n".join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
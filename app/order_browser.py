@@ -0,0 +1,166 @@
+import asyncio
+import re
+import tempfile
+from pathlib import Path
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
+from telegram.ext import ContextTypes
+from . import async_db as db, sla
+from .config import MERCHANT_ID, SLA_SECONDS
+from .metrics import timed_handler
+from .replies import text
+from .utils import final_report
+
+# متصفح طلبات التاجر: رسالة واحدة تُعدَّل في مكانها، وكل صفحة = بحث واحد في الفهرس + تعديل واحد.
+# callback_data = "ob:<filter>:<direction>:<cursor>" حيث filter = a | s<status> | u<user_id>
+PAGE_SIZE = 10
+STATUSES = ("pending", "done", "canceled", "expired")
+DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def _parse_filter(token: str):
+    if token.startswith("s"):
+        return {"status": token[1:]}
+    if token.startswith("u"):
+        return {"user_id": int(token[1:])}
+    return {}
+
+def _title(token: str) -> str:
+    if token.startswith("s"):
+        return token[1:]
+    if token.startswith("u"):
+        return text("orders_title_user", user_id=token[1:])
+    return text("orders_title_all")
+
+async def _fetch_page(token: str, direction: str = "", cursor: int = None):
+    # نطلب عنصرًا إضافيًا لمعرفة وجود صفحة تالية في نفس اتجاه التصفح دون استعلام ثانٍ
+    kwargs = _parse_filter(token)
+    if direction == "n":
+        kwargs["before_id"] = cursor
+    elif direction == "p":
+        kwargs["after_id"] = cursor
+    orders = await db.page_orders(limit=PAGE_SIZE + 1, **kwargs)
+    more = len(orders) > PAGE_SIZE
+    if direction == "p" and not more:
+        # وصلنا لأحدث الطلبات: نعرض الصفحة الأولى كاملة بدل صفحة ناقصة
+        return await _fetch_page(token)
+    if more:
+        # الاتجاه "p" يعيد الأحدث أولًا؛ العنصر الزائد في البداية
+        orders = orders[1:] if direction == "p" else orders[:PAGE_SIZE]
+    has_newer = more if direction == "p" else direction == "n"
+    has_older = more if direction != "p" else True
+    return orders, has_newer, has_older
+
+def _render(token: str, orders, has_newer: bool, has_older: bool):
+    lines = [text("orders_title", title=_title(token))]
+    lines += [
+        text("orders_line", order_id=o["id"], status=o["status"], device_id=o["device_id"] or "-", created_at=o["created_at"])
+        for o in orders
+    ]
+    buttons = []
+    if has_newer:
+        buttons.append(InlineKeyboardButton(text("btn_newer"), callback_data=f"ob:{token}:p:{orders[0]['id']}"))
+    if has_older:
+        buttons.append(InlineKeyboardButton(text("btn_older"), callback_data=f"ob:{token}:n:{orders[-1]['id']}"))
+    return "\n".join(lines), InlineKeyboardMarkup([buttons]) if buttons else None
+
+@timed_handler
+async def orders_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    if not user or user.id != MERCHANT_ID:
+        return
+    arg = context.args[0].lower() if context.args else ""
+    if not arg:
+        token = "a"
+    elif arg.isdigit():
+        token = f"u{arg}"
+    elif arg in STATUSES:
+        token = f"s{arg}"
+    else:
+        await update.message.reply_text(text("orders_usage"))
+        return
+    orders, has_newer, has_older = await _fetch_page(token)
+    if not orders:
+        await update.message.reply_text(text("orders_empty"))
+        return
+    body, keyboard = _render(token, orders, has_newer, has_older)
+    await update.message.reply_text(body, reply_markup=keyboard)
+
+@timed_handler
+async def order_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    if not user or user.id != MERCHANT_ID:
+        return
+    if not context.args or not context.args[0].isdigit():
+        await update.message.reply_text(text("order_usage"))
+        return
+    order_id = int(context.args[0])
+    order = await db.get_order(order_id)
+    if not order:
+        await update.message.reply_text(text("order_not_found"))
+        return
+    await update.message.reply_text(final_report(order_id, order))
+
+@timed_handler
+async def queue_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    if not user or user.id != MERCHANT_ID:
+        return
+    # استعلام واحد بكلفة ثابتة (queue_snapshot)؛ قائمة الطلبات نفسها عبر /orders pending
+    snapshot = await db.queue_snapshot()
+    histogram = snapshot["histogram"]
+    oldest = snapshot["oldest_seconds"]
+    share = sla.within(histogram, SLA_SECONDS)
+    await update.message.reply_text(text(
+        "queue_stats",
+        pending=snapshot["pending"],
+        oldest=text("queue_oldest", age=sla.fmt_duration(oldest)) if oldest is not None else text("queue_empty"),
+        count=sum(count for _, count in histogram),
+        p50=sla.fmt_bound(sla.percentile(histogram, 0.5)),
+        p95=sla.fmt_bound(sla.percentile(histogram, 0.95)),
+        sla=sla.fmt_duration(SLA_SECONDS),
+        within="-" if share is None else f"{share:.0f}%",
+    ))
+
+@timed_handler
+async def browse_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    if not query.from_user or query.from_user.id != MERCHANT_ID:
+        await query.answer()
+        return
+    _, token, direction, cursor = query.data.split(":")
+    orders, has_newer, has_older = await _fetch_page(token, direction, int(cursor))
+    if not orders:
+        await query.answer(text("orders_no_more"))
+        return
+    await query.answer()
+    body, keyboard = _render(token, orders, has_newer, has_older)
+    try:
+        await query.edit_message_text(body, reply_markup=keyboard)
+    except BadRequest as e:
+        # ضغط مزدوج على نفس الزر: المحتوى لم يتغير
+        if "not modified" not in str(e).lower():
+            raise
+
+@timed_handler
+async def export_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    if not user or user.id != MERCHANT_ID:
+        return
+    args = context.args or []
+    if len(args) > 2 or not all(DATE_RE.match(a) for a in args):
+        await update.message.reply_text(text("export_usage"))
+        return
+    # استيراد متأخر: التصدير ليس على مسار بدء التشغيل
+    from . import archive
+    start = args[0] if args else None
+    end = args[1] if len(args) > 1 else None
+    # القراءة من ملفات الأرشيف والكتابة إلى ملف مؤقت بشكل متدفق خارج حلقة الأحداث
+    with tempfile.TemporaryDirectory() as tmp:
+        dest = Path(tmp) / f"orders-{start or 'all'}-{end or 'now'}.csv.gz"
+        count = await asyncio.to_thread(archive.export_csv, dest, start, end)
+        if not count:
+            await update.message.reply_text(text("export_empty"))
+            return
+        with open(dest, "rb") as f:
+            await update.message.reply_document(f, filename=dest.name, caption=text("export_caption", count=count))
@@ -0,0 +1,41 @@
+import time
+from collections import OrderedDict
+from .metrics import CACHE
+
+# كاش للطلبات بنمط write-through: القراءة من الذاكرة إن وُجدت، وكل كتابة ناجحة تُطبَّق على النسخة المخزنة.
+# مع عدة عمليات قد تكتب عملية أخرى على نفس الطلب، لذلك TTL قصير؛ الانتقالات الشرطية تبقى في SQL
+MAX_ORDERS = 2048
+TTL = 60
+
+_orders = OrderedDict()   # order_id -> (expires_at, order)
+
+
+def get(order_id: int):
+    entry = _orders.get(order_id)
+    if entry is None or entry[0] < time.monotonic():
+        if entry is not None:
+            del _orders[order_id]
+        CACHE.inc("orders", "miss")
+        return None
+    _orders.move_to_end(order_id)
+    CACHE.inc("orders", "hit")
+    # نسخة حتى لا يغيّر المستدعي الكاش بالخطأ
+    return dict(entry[1])
+
+def put(order_id: int, order: dict):
+    _orders[order_id] = (time.monotonic() + TTL, dict(order))
+    _orders.move_to_end(order_id)
+    if len(_orders) > MAX_ORDERS:
+        _orders.popitem(last=False)
+
+def apply(order_id: int, fields: dict):
+    entry = _orders.get(order_id)
+    if entry is not None:
+        entry[1].update(fields)
+        entry[1]["updated_at"] = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+
+def invalidate(order_id: int):
+    _orders.pop(order_id, None)
+
+def clear():
+    _orders.clear()
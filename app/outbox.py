@@ -0,0 +1,179 @@
+import asyncio
+import itertools
+import logging
+import time
+from telegram import InputMediaDocument, InputMediaPhoto
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+from .ratelimit import KeyedLimiter
+
+logger = logging.getLogger(__name__)
+
+# طابور إرسال صادر لإشعارات التاجر: المعالج يضيف الرسالة ويكمل فورًا،
+# وعامل واحد يرسل حسب الأولوية مع حد لكل محادثة وإعادة محاولة بدون إسقاط
+PRIORITY_ORDER = 0      # الطلبات وتقارير التفعيل
+PRIORITY_NOTICE = 1     # إشعارات الزوار وما يشبهها
+
+PER_CHAT_RATE = 1       # رسالة/ثانية لكل محادثة (حد تيليغرام)
+PER_CHAT_BURST = 3
+DIGEST_INTERVAL = 60    # أقل مدة بين رسالتَي ملخص لنفس النوع
+MAX_BACKOFF = 60
+STOP_TIMEOUT = 30
+
+DIGEST_TITLES = {
+    "visitors": "📢 {n} زوار جدد خلال آخر دقيقة:",
+}
+DIGEST_MAX_LINES = 10
+
+# ألبومات: عناصر من نفس النوع تُجمع خلال ALBUM_WINDOW ثانية وتُرسل بـ send_media_group (حتى 10 عناصر)
+ALBUM_WINDOW = 5
+ALBUM_MAX = 10
+ALBUM_KINDS = {
+    "photo": ("send_photo", InputMediaPhoto),
+    "document": ("send_document", InputMediaDocument),
+}
+
+_queue = asyncio.PriorityQueue()
+_seq = itertools.count()
+_limiter = KeyedLimiter(PER_CHAT_RATE, PER_CHAT_BURST)
+_digests = {}           # (chat_id, key) -> [lines]
+_digest_sent = {}       # (chat_id, key) -> آخر وقت إرسال
+_digest_footers = {}    # key -> دالة تعيد سطرًا ختاميًا (مثل إجمالي الزوار)
+_albums = {}            # (chat_id, kind) -> (وقت أول عنصر, [(file_id, caption)])
+_bot = None
+_tasks = []
+
+
+def enqueue(chat_id: int, text: str = None, priority: int = PRIORITY_ORDER, method: str = "send_message",
+            on_sent=None, **kwargs):
+    # on_sent: دالة async تستقبل الرسالة المرسلة (مثلًا لحفظ message_id)
+    if text is not None:
+        kwargs["text"] = text
+    _queue.put_nowait((priority, next(_seq), chat_id, method, kwargs, on_sent))
+
+def add_digest_line(chat_id: int, key: str, line: str):
+    _digests.setdefault((chat_id, key), []).append(line)
+
+def add_album_item(chat_id: int, kind: str, file_id: str, caption: str = None):
+    key = (chat_id, kind)
+    if key not in _albums:
+        _albums[key] = (time.monotonic(), [])
+    items = _albums[key][1]
+    items.append((file_id, caption))
+    if len(items) >= ALBUM_MAX:
+        _send_album(key)
+
+def set_digest_footer(key: str, footer):
+    _digest_footers[key] = footer
+
+def queue_depth() -> int:
+    return _queue.qsize() + sum(1 for lines in _digests.values() if lines) + len(_albums)
+
+
+def _render_digest(key: str, lines) -> str:
+    if len(lines) == 1:
+        text = lines[0]
+    else:
+        shown = lines[-DIGEST_MAX_LINES:]
+        text = DIGEST_TITLES.get(key, "📢 {n} إشعارات:").format(n=len(lines)) + "\n" + "\n".join(shown)
+        if len(lines) > len(shown):
+            text += f"\n… و{len(lines) - len(shown)} آخرين"
+    footer = _digest_footers.get(key)
+    if footer:
+        text += "\n" + footer()
+    return text
+
+def _flush_digests(force: bool = False):
+    now = time.monotonic()
+    for (chat_id, key), lines in _digests.items():
+        if not lines:
+            continue
+        if not force and now - _digest_sent.get((chat_id, key), 0) < DIGEST_INTERVAL:
+            continue
+        _digest_sent[(chat_id, key)] = now
+        enqueue(chat_id, _render_digest(key, lines), priority=PRIORITY_NOTICE)
+        lines.clear()
+
+def _send_album(key):
+    chat_id, kind = key
+    _, items = _albums.pop(key)
+    method, media_cls = ALBUM_KINDS[kind]
+    # عنصر واحد لا يُرسل كألبوم (send_media_group يتطلب عنصرين على الأقل)
+    if len(items) == 1:
+        file_id, caption = items[0]
+        enqueue(chat_id, method=method, **{kind: file_id, "caption": caption})
+        return
+    enqueue(chat_id, method="send_media_group", media=[media_cls(file_id, caption=caption) for file_id, caption in items])
+
+def _flush_albums(force: bool = False):
+    now = time.monotonic()
+    for key, (first, _) in list(_albums.items()):
+        if force or now - first >= ALBUM_WINDOW:
+            _send_album(key)
+
+
+async def _digest_loop():
+    while True:
+        await asyncio.sleep(1)
+        _flush_digests()
+        _flush_albums()
+
+async def _send(chat_id: int, method: str, kwargs: dict, on_sent):
+    attempt = 0
+    while True:
+        await _limiter.acquire(chat_id)
+        try:
+            msg = await getattr(_bot, method)(chat_id=chat_id, **kwargs)
+        except RetryAfter as e:
+            wait = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+            _limiter.bucket(chat_id).penalize(wait)
+            continue
+        except (BadRequest, Forbidden) as e:
+            # خطأ دائم لن تصلحه إعادة المحاولة
+            logger.error(f"Outbox {method} to {chat_id} rejected: {e}")
+            return
+        except TelegramError as e:
+            attempt += 1
+            delay = min(MAX_BACKOFF, 2 ** attempt)
+            logger.warning(f"Outbox {method} to {chat_id} failed ({e}), retry in {delay}s")
+            await asyncio.sleep(delay)
+            continue
+        if on_sent:
+            try:
+                await on_sent(msg)
+            except Exception as e:
+                logger.warning(f"Outbox on_sent callback failed: {e}")
+        return
+
+async def _worker():
+    while True:
+        _, _, chat_id, method, kwargs, on_sent = await _queue.get()
+        try:
+            await _send(chat_id, method, kwargs, on_sent)
+        finally:
+            _queue.task_done()
+
+
+def share_rate(workers: int):
+    # وضع العمليات المتعددة: كل عملية لها طابورها وحدّها، وإشعارات التاجر تصل من كلها لنفس المحادثة،
+    # فيُقسم حد المحادثة على عدد العمليات كي يبقى المجموع ضمن حد تيليغرام
+    global _limiter
+    _limiter = KeyedLimiter(PER_CHAT_RATE / workers, max(1, PER_CHAT_BURST // workers))
+
+def start(app):
+    global _bot
+    _bot = app.bot
+    loop = asyncio.get_running_loop()
+    _tasks.append(loop.create_task(_worker()))
+    _tasks.append(loop.create_task(_digest_loop()))
+
+async def stop():
+    # إرسال كل ما تبقى (بما فيه الملخصات) قبل الإيقاف
+    _flush_digests(force=True)
+    _flush_albums(force=True)
+    try:
+        await asyncio.wait_for(_queue.join(), STOP_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.error(f"Outbox stopped with {_queue.qsize()} unsent messages")
+    for task in _tasks:
+        task.cancel()
+    _tasks.clear()
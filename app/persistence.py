@@ -0,0 +1,144 @@
+import asyncio
+import json
+import logging
+import time
+from telegram.ext import BasePersistence, PersistenceInput
+from . import async_db as db
+from . import database
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL = 24 * 3600     # الجلسات غير المستخدمة خلال هذه المدة تُحذف من الذاكرة والقاعدة
+UPDATE_INTERVAL = 5         # كل كم ثانية يكتب PTB التغييرات
+
+
+class SQLitePersistence(BasePersistence):
+    # يحفظ context.user_data فقط (خطوات الطلب) في جدول sessions.
+    # الكتابات تُجمع في معاملة واحدة، والجلسة الفارغة تُحذف بدل حفظها.
+    # shared=True: قبل كل تحديث تُقرأ نسخة أحدث كتبتها عملية أخرى إن وُجدت
+    def __init__(self, ttl: float = SESSION_TTL, update_interval: float = UPDATE_INTERVAL, shared: bool = True):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.ttl = ttl
+        self.shared = shared
+        self._versions = {}     # user_id -> updated_at آخر نسخة معروفة
+        # user_id -> آخر استخدام لكل مستخدم في app.user_data، حتى الجلسات الفارغة (user_data.clear())
+        # التي لا تُحفظ في القاعدة ولا تظهر في _versions؛ الإخلاء يعتمد عليه فتبقى الذاكرة محدودة
+        self._touched = {}
+        self._dirty = {}
+        self._deleted = set()
+        self._write_task = None
+
+    async def get_user_data(self):
+        rows = await db.run(database.load_sessions, time.time() - self.ttl)
+        data = {}
+        for user_id, blob, updated_at in rows:
+            data[user_id] = json.loads(blob)
+            self._versions[user_id] = updated_at
+            self._touched[user_id] = updated_at
+        return data
+
+    async def update_user_data(self, user_id: int, data: dict):
+        self._touched[user_id] = time.time()
+        self._deleted.discard(user_id)
+        self._dirty[user_id] = data
+        self._schedule_write()
+
+    async def drop_user_data(self, user_id: int):
+        self._dirty.pop(user_id, None)
+        self._versions.pop(user_id, None)
+        self._touched.pop(user_id, None)
+        self._deleted.add(user_id)
+        self._schedule_write()
+
+    async def refresh_user_data(self, user_id: int, user_data: dict):
+        self._touched[user_id] = time.time()
+        if not self.shared or user_id in self._dirty:
+            return
+        row = await db.run(database.get_session_if_newer, user_id, self._versions.get(user_id, 0))
+        if row:
+            user_data.clear()
+            user_data.update(json.loads(row[0]))
+            self._versions[user_id] = row[1]
+
+    async def flush(self):
+        if self._write_task:
+            await self._write_task
+        await self._write()
+
+    def _schedule_write(self):
+        # PTB يستدعي update_user_data لكل مستخدم معًا؛ مهمة كتابة واحدة تجمعهم
+        if self._write_task is None or self._write_task.done():
+            self._write_task = asyncio.get_running_loop().create_task(self._write_soon())
+
+    async def _write_soon(self):
+        await asyncio.sleep(0)
+        await self._write()
+
+    async def _write(self):
+        dirty, self._dirty = self._dirty, {}
+        deleted, self._deleted = self._deleted, set()
+        if not dirty and not deleted:
+            return
+        now = time.time()
+        rows = []
+        for user_id, data in dirty.items():
+            if data:
+                rows.append((user_id, json.dumps(data, ensure_ascii=False, default=str), now))
+                self._versions[user_id] = now
+            else:
+                deleted.add(user_id)
+                self._versions.pop(user_id, None)
+        try:
+            await db.run(database.save_sessions, rows, list(deleted))
+        except Exception as e:
+            logger.warning(f"Saving {len(rows)} sessions failed: {e}")
+            for user_id, data in dirty.items():
+                self._dirty.setdefault(user_id, data)
+            self._deleted |= deleted - set(self._dirty)
+
+    async def evict_stale(self, app) -> int:
+        # حذف الجلسات المهملة من ذاكرة التطبيق ومن القاعدة
+        cutoff = time.time() - self.ttl
+        stale = [user_id for user_id, ts in self._touched.items() if ts < cutoff]
+        for user_id in stale:
+            del self._touched[user_id]
+            app.drop_user_data(user_id)
+        await db.run(database.delete_sessions_before, cutoff)
+        return len(stale)
+
+    # لا نحفظ بيانات البوت/المحادثة/الأزرار
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str):
+        return {}
+
+    async def update_chat_data(self, chat_id: int, data: dict):
+        pass
+
+    async def update_bot_data(self, data: dict):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def update_conversation(self, name: str, key, new_state):
+        pass
+
+    async def drop_chat_data(self, chat_id: int):
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict):
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict):
+        pass
@@ -0,0 +1,95 @@
+import asyncio
+import itertools
+import logging
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from .database import DB_PATH
+
+logger = logging.getLogger(__name__)
+
+# نسخة محلية من صور الإشعار للمراجعة لاحقًا: ملف لكل file_unique_id (فلا تُنزَّل الصورة المكررة مرتين)،
+# والحجم الكلي محدود بـ PROOF_STORE_MB؛ الأقدم استخدامًا يُحذف أولًا
+PROOF_DIR = Path(os.getenv("PROOF_DIR") or DB_PATH.parent / "proofs")
+MAX_BYTES = int(float(os.getenv("PROOF_STORE_MB", "200") or 0) * 1024 * 1024)
+
+_files = None           # name -> size، بترتيب الاستخدام (الأقدم أولًا)
+_total = 0
+_parts = itertools.count()
+_load_lock = asyncio.Lock()
+_inflight = set()        # أسماء قيد التنزيل: الصورة نفسها لا تُنزَّل مرتين معًا
+PART_SUFFIX = ".part"   # التنزيل إلى اسم مؤقت ثم os.replace؛ تنزيل فاشل لا يترك ملفًا باسم نهائي
+STALE_PART = 3600
+
+# _files و_total تُعدَّل على حلقة الأحداث فقط (ومعها الحذف عند تجاوز الحد)؛ الـ Thread للمسح والتنزيل والنقل
+
+
+def _scan():
+    PROOF_DIR.mkdir(parents=True, exist_ok=True)
+    entries = []
+    for p in PROOF_DIR.iterdir():
+        if not p.is_file():
+            continue
+        st = p.stat()
+        if p.name.endswith(PART_SUFFIX):
+            # بقايا تنزيل انقطع (إيقاف مفاجئ)؛ الحديثة قد تكون تنزيلًا جاريًا في عملية أخرى
+            if st.st_mtime < time.time() - STALE_PART:
+                p.unlink(missing_ok=True)
+            continue
+        entries.append((st.st_mtime, p.name, st.st_size))
+    return sorted(entries)
+
+async def _ensure_loaded():
+    # مسح واحد للمجلد: المسح يحذف بقايا .part فلا يجوز أن يتزامن مع تنزيلات بدأت
+    global _files, _total
+    async with _load_lock:
+        if _files is None:
+            entries = await asyncio.to_thread(_scan)
+            _files = OrderedDict((name, size) for _, name, size in entries)
+            _total = sum(_files.values())
+
+def _evict():
+    # على الحلقة مع الحالة نفسها (حذف ملفات قليلة سريع): لا يتداخل مع حفظ يعيد نفس الاسم
+    global _total
+    while _total > MAX_BYTES and _files:
+        name, size = _files.popitem(last=False)
+        (PROOF_DIR / name).unlink(missing_ok=True)
+        _total -= size
+
+def _commit(part: Path, path: Path) -> int:
+    os.replace(part, path)
+    return path.stat().st_size
+
+def path_for(unique_id: str, suffix: str = ".jpg") -> Path:
+    return PROOF_DIR / f"{unique_id}{suffix}"
+
+async def save(bot, file_id: str, unique_id: str, suffix: str = ".jpg"):
+    global _total
+    if MAX_BYTES <= 0:
+        return
+    path = path_for(unique_id, suffix)
+    # اسم مؤقت فريد: تنزيلان متزامنان لنفس الصورة لا يكتبان في الملف نفسه
+    part = path.with_name(f"{path.name}.{os.getpid()}.{next(_parts)}{PART_SUFFIX}")
+    try:
+        await _ensure_loaded()
+        if path.name in _files:
+            # موجودة مسبقًا: تحديث ترتيب الاستخدام فقط
+            _files.move_to_end(path.name)
+            await asyncio.to_thread(os.utime, path)
+            return
+        if path.name in _inflight:
+            return
+        _inflight.add(path.name)
+        try:
+            tg_file = await bot.get_file(file_id)
+            await tg_file.download_to_drive(part)
+            size = await asyncio.to_thread(_commit, part, path)
+        finally:
+            _inflight.discard(path.name)
+        _total += size - _files.pop(path.name, 0)
+        _files[path.name] = size
+        _evict()
+    except Exception as e:
+        logger.warning(f"Proof store save for {unique_id} failed: {e}")
+        await asyncio.to_thread(part.unlink, missing_ok=True)
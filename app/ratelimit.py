@@ -0,0 +1,60 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    # دلو رموز: rate رمز في الثانية وسعة capacity (الحد الأقصى للدفعة)
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, n: float = 1) -> bool:
+        self._refill()
+        if self.tokens >= n:
+            self.tokens -= n
+            return True
+        return False
+
+    async def acquire(self, n: float = 1):
+        async with self._lock:
+            while not self.try_acquire(n):
+                await asyncio.sleep((n - self.tokens) / self.rate)
+
+    def penalize(self, seconds: float):
+        # بعد RetryAfter: إيقاف كل المرسلين لمدة seconds
+        self._refill()
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+class KeyedLimiter:
+    # دلو لكل مفتاح (chat_id)؛ عدد الدلاء محدود بـ max_keys (الأقدم يُحذف)
+    def __init__(self, rate: float, capacity: float = None, max_keys: int = 10_000):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    def bucket(self, key) -> TokenBucket:
+        b = self._buckets.get(key)
+        if b is None:
+            b = self._buckets[key] = TokenBucket(self.rate, self.capacity)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return b
+
+    def try_acquire(self, key, n: float = 1) -> bool:
+        return self.bucket(key).try_acquire(n)
+
+    async def acquire(self, key, n: float = 1):
+        await self.bucket(key).acquire(n)
@@ -0,0 +1,139 @@
+from functools import lru_cache
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+# كتالوج الردود: النصوص والأزرار الثابتة تُبنى مرة واحدة عند الاستيراد،
+# وأزرار كل طلب تُحفظ في LRU محدود. إضافة لغة = إضافة قاموس في TEXTS
+DEFAULT_LANG = "ar"
+
+TEXTS = {
+    "ar": {
+        "preparing": "⏳ جارٍ تجهيز الخدمة... يرجى الانتظار لحظات.",
+        "start_caption": (
+            "⚠️ تنويه هام\n"
+            "قد يتأخر رد البوت أحيانًا لمدّة لا تتجاوز دقيقة واحدة نتيجة الضغط.\n\n"
+            "في حال تأخر أكثر من ذلك، أرسل رمز النسخة الكاملة عبر واتساب من داخل التطبيق.\n\n"
+            "طرق الدفع:\n"
+            "1) الشام كاش:\n"
+            "- امسح باركود الحساب في الأعلى أو استخدم العنوان:\n"
+            "`ce95cda303cc0c382736307089e2ddeb`\n\n"
+            "2) سيريتل كاش:\n"
+            "- تحويل كاش يدوي إلى الرقم: `0997625546` (ليس تعبئة وحدات).\n\n"
+            "الخطوة التالية:\n"
+            "- انسخ رمز النسخة الكاملة من التطبيق، ثم الصقه هنا وأرسله.\n"
+        ),
+        "qr_missing": (
+            "⚠️ لم يتم العثور على صورة QR (qr.png). اكمل الخطوات دون الصورة.\n"
+            "أرسل رمز النسخة الكاملة هنا للمتابعة."
+        ),
+        "ask_proof": "📸 أرسل الآن صورة إشعار الدفع (لقطة شاشة) أو نص إشعار الدفع أو رقم العملية.",
+        "press_send": "✅ ممتاز.\nاضغط إرسال لاستلام بيانات الدفع الخاصة بك.",
+        "ask_device": "📱 أدخل رمز النسخة الكاملة الخاصة بجهازك (انسخه من التطبيق ثم الصقه هنا).",
+        "order_not_found": "❌ الطلب غير موجود.",
+        "sent_to_team": "📤 تم إرسال طلبك لفريق العمل ✅",
+        "order_canceled": "❌ تم إلغاء طلبك.",
+        "throttled": "⏳ طلبات كثيرة، حاول بعد لحظات.",
+        "too_many_pending": "⏳ لديك طلبات قيد المراجعة بالفعل. انتظر معالجتها قبل إرسال طلب جديد.",
+        "throttle_stats": (
+            "🚦 حماية التدفق\n"
+            "تحديثات مُسقطة: {updates}\n"
+            "طلبات مرفوضة (حد الطلبات المعلقة): {orders}\n"
+            "مستخدمون متتبَّعون: {tracked}\n"
+            "الأكثر رفضًا:\n{top}"
+        ),
+        "throttle_line": "{user_id}: {count}",
+        "order_already_handled": "ℹ️ تمت معالجة هذا الطلب مسبقًا.",
+        "visitor_count": "📊 عدد الزوار الذين ضغطوا Start: {total}",
+        "visitor_line": "👤 زائر جديد: {name} (ID: {user_id})",
+        "visitors_total": "📊 إجمالي الزوار الآن: {total}",
+        "new_order": (
+            "🟦 طلب جديد #{order_id}\n"
+            "🔢 رقم الجهاز: {device_id}\n"
+            "🧾 إشعار: {notify_msg}\n"
+            "📌 الحالة: {status}"
+        ),
+        "proof_caption": "🖼️ صورة إشعار الدفع لطلب #{order_id}",
+        "proof_reused": "⚠️ صورة الإشعار نفسها مستخدمة في الطلبات: {orders}",
+        "activation_code": "🔑 كود التفعيل الخاص بجهازك: {code}",
+        "final_report_merchant": "📊 تقرير نهائي:\n{report}",
+        "final_report_user": "📊 تقرير طلبك:\n{report}",
+        "order_canceled_merchant": "❌ تم إلغاء الطلب #{order_id} من قبل فريق العمل.",
+        "final_report": (
+            "📊 التقرير النهائي\n"
+            "رقم الطلب: #{order_id}\n"
+            "🔢 رمز نسختك الكاملة: {device_id}\n"
+            "🧾 إشعار الدفع: {notify_msg}\n"
+            "🖼️ صورة إشعار: {proof}\n"
+            "🔑 كود التفعيل: {activation_code}\n"
+            "📌 الحالة: {status}"
+        ),
+        "pending_digest": "⏳ ملخص الطلبات المعلقة: {count} طلب\n{lines}",
+        "pending_digest_line": "#{order_id} — {device_id} — منذ {created_at}",
+        "queue_stats": (
+            "📥 طابور الطلبات\n"
+            "معلّقة: {pending}\n"
+            "أقدم طلب: {oldest}\n"
+            "⏱ زمن التفعيل ({count} طلب): p50 ≤ {p50} · p95 ≤ {p95}\n"
+            "ضمن الوعد ({sla}): {within}"
+        ),
+        "queue_empty": "لا يوجد",
+        "queue_oldest": "منذ {age}",
+        "sla_reminder_1": "⏰ {count} طلب تجاوز وعد الرد ({age}):\n{lines}",
+        "sla_reminder_2": "⚠️ تأخير: {count} طلب معلّق منذ أكثر من {age}:\n{lines}",
+        "sla_reminder_3": "🚨 عاجل: {count} طلب معلّق منذ أكثر من {age}:\n{lines}",
+        "orders_title": "📋 الطلبات: {title}",
+        "orders_title_all": "الكل",
+        "orders_title_user": "المستخدم {user_id}",
+        "orders_line": "#{order_id} — {status} — {device_id} — {created_at}",
+        "orders_empty": "📭 لا توجد طلبات.",
+        "orders_no_more": "لا توجد صفحات أخرى.",
+        "orders_usage": "✍️ الاستخدام: /orders [pending|done|canceled|expired|رقم المستخدم]",
+        "order_usage": "✍️ الاستخدام: /order رقم_الطلب",
+        "merchant_only": "❌ هذا البوت مخصص للتاجر فقط.",
+        "serial_not_found": "⚠️ لم يتم العثور على رمز تسلسلي صالح في النص.",
+        "serial_codes_file": "🔑 أكواد التفعيل لـ {count} جهاز",
+        "export_usage": "✍️ الاستخدام: /export [من YYYY-MM-DD] [إلى YYYY-MM-DD]",
+        "export_empty": "📭 لا توجد طلبات مؤرشفة في هذا المدى.",
+        "export_caption": "📦 {count} طلب مؤرشف",
+        "proof_yes": "✅ موجود",
+        "proof_no": "🚫 لا يوجد",
+        "btn_activate": "🔑 إرسال كود التفعيل",
+        "btn_cancel": "❌ إلغاء الطلب",
+        "btn_new_order": "🔄 طلب جديد",
+        "btn_send": "📤 إرسال",
+        "btn_newer": "⬅️ الأحدث",
+        "btn_older": "الأقدم ➡️",
+    },
+}
+
+
+def text(key: str, lang: str = DEFAULT_LANG, **kwargs) -> str:
+    t = TEXTS.get(lang, TEXTS[DEFAULT_LANG]).get(key) or TEXTS[DEFAULT_LANG][key]
+    return t.format(**kwargs) if kwargs else t
+
+
+def _build_new_order_keyboard(lang: str):
+    return InlineKeyboardMarkup([[InlineKeyboardButton(text("btn_new_order", lang), callback_data="new_order")]])
+
+# الأزرار الثابتة (InlineKeyboardMarkup غير قابل للتعديل فيمكن مشاركته)
+NEW_ORDER_KEYBOARDS = {lang: _build_new_order_keyboard(lang) for lang in TEXTS}
+
+
+def new_order_keyboard(lang: str = DEFAULT_LANG):
+    return NEW_ORDER_KEYBOARDS.get(lang) or NEW_ORDER_KEYBOARDS[DEFAULT_LANG]
+
+@lru_cache(maxsize=1024)
+def team_keyboard(order_id: int, lang: str = DEFAULT_LANG):
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(text("btn_activate", lang), callback_data=f"activate:{order_id}")],
+        [InlineKeyboardButton(text("btn_cancel", lang), callback_data=f"cancel:{order_id}")]
+    ])
+
+@lru_cache(maxsize=1024)
+def send_team_keyboard(order_id: int, lang: str = DEFAULT_LANG):
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(text("btn_send", lang), callback_data=f"send_team:{order_id}")]
+    ])
+
+def lang_of(user) -> str:
+    code = getattr(user, "language_code", None) or DEFAULT_LANG
+    return code if code in TEXTS else DEFAULT_LANG
@@ -0,0 +1,39 @@
+import ssl
+import time
+from functools import lru_cache
+import certifi
+from telegram.request import HTTPXRequest
+from . import metrics
+
+
+@lru_cache(maxsize=1)
+def ssl_context() -> ssl.SSLContext:
+    # سياق TLS واحد لكل عملاء httpx: تحميل شهادات certifi مكلف ويتكرر مع كل عميل عند بدء التشغيل
+    return ssl.create_default_context(cafile=certifi.where())
+
+
+class InstrumentedRequest(HTTPXRequest):
+    # يقيس زمن كل استدعاء Bot API وأخطاءه حسب اسم الطريقة (sendMessage, ...)
+    def __init__(self, *args, httpx_kwargs: dict = None, **kwargs):
+        super().__init__(*args, httpx_kwargs={"verify": ssl_context(), **(httpx_kwargs or {})}, **kwargs)
+
+    @staticmethod
+    def method_label(url: str) -> str:
+        # تنزيل الملفات (/file/bot<token>/<path>) يمر من نفس الطلب؛ اسم الملف تسمية غير محدودة
+        if "/file/bot" in url:
+            return "download"
+        return url.rsplit("/", 1)[-1]
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        api_method = self.method_label(url)
+        t0 = time.perf_counter()
+        try:
+            code, payload = await super().do_request(url, method, *args, **kwargs)
+        except Exception:
+            metrics.API_ERRORS.inc(api_method)
+            raise
+        finally:
+            metrics.API_SECONDS.observe(time.perf_counter() - t0, api_method)
+        if code >= 400:
+            metrics.API_ERRORS.inc(api_method)
+        return code, payload
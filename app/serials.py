@@ -0,0 +1,52 @@
+import io
+import re
+from functools import lru_cache
+from .utils import generate_activation_code
+
+# استخراج الرموز التسلسلية بالجملة: مسح متدفق على أجزاء النص مع إزالة التكرار،
+# وكاش LRU محدود لـ device_id -> كود التفعيل
+UUID_REGEX = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+UUID_LEN = 36
+CHUNK_SIZE = 256 * 1024
+MESSAGE_LIMIT = 4000    # أقصى طول للرد النصي قبل التحويل إلى ملف
+
+
+@lru_cache(maxsize=4096)
+def activation_code(device_id: str) -> str:
+    return generate_activation_code(device_id)
+
+def iter_uuids(chunks):
+    # آخر UUID_LEN-1 محرف من كل جزء تُحمل للجزء التالي حتى لا يضيع رمز مقسوم على حدّين
+    carry = ""
+    for chunk in chunks:
+        buf = carry + chunk
+        last_end = 0
+        for m in UUID_REGEX.finditer(buf):
+            last_end = m.end()
+            yield m.group(0)
+        carry = buf[max(last_end, len(buf) - UUID_LEN + 1):]
+
+def iter_chunks(f, size: int = CHUNK_SIZE):
+    while True:
+        chunk = f.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+def unique_codes(chunks) -> dict:
+    # dict يحفظ ترتيب الظهور الأول
+    codes = {}
+    for device_id in iter_uuids(chunks):
+        if device_id not in codes:
+            codes[device_id] = activation_code(device_id)
+    return codes
+
+def codes_from_bytes(data: bytes) -> dict:
+    f = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", errors="ignore")
+    return unique_codes(iter_chunks(f))
+
+def render_codes(codes: dict) -> str:
+    # رمز واحد: الكود فقط كما في السابق؛ عدة رموز: سطر لكل جهاز
+    if len(codes) == 1:
+        return next(iter(codes.values()))
+    return "\n".join(f"{device_id} {code}" for device_id, code in codes.items())
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import queue
+import signal
+from tornado.httpserver import HTTPServer
+from tornado.web import Application as WebApplication, RequestHandler
+
+logger = logging.getLogger(__name__)
+
+# وضع الإنتاج متعدد العمليات: واجهة Webhook واحدة تستقبل التحديثات وتوزعها على N عملية.
+# كل تحديثات نفس المحادثة تذهب لنفس العملية فيبقى ترتيبها محفوظًا،
+# وكل العمليات تتشارك قاعدة SQLite (WAL) نفسها.
+# مسارات الصحة لكل عملية على حدة: العملية i تخدم /ping و/ready و/metrics على PING_PORT + i
+# (الطابور، تأخر الحلقة، والعدادات تخصها وحدها)، فتُجمع بسحب كل المنافذ
+QUEUE_SIZE = 10_000
+DRAIN_TIMEOUT = 30
+ALLOWED_UPDATES = ["message", "callback_query"]
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+def route_key(update: dict) -> int:
+    # معرف المحادثة (أو المرسل) لاختيار العملية
+    for value in update.values():
+        if not isinstance(value, dict):
+            continue
+        chat = value.get("chat") or (value.get("message") or {}).get("chat")
+        if chat and "id" in chat:
+            return chat["id"]
+        sender = value.get("from")
+        if sender and "id" in sender:
+            return sender["id"]
+    return update.get("update_id", 0)
+
+
+class WebhookHandler(RequestHandler):
+    def initialize(self, queues, secret):
+        self.queues = queues
+        self.secret = secret
+
+    def post(self):
+        if self.secret and self.request.headers.get("X-Telegram-Bot-Api-Secret-Token") != self.secret:
+            self.set_status(403)
+            return
+        try:
+            data = json.loads(self.request.body)
+        except ValueError:
+            self.set_status(400)
+            return
+        target = self.queues[route_key(data) % len(self.queues)]
+        try:
+            target.put_nowait(self.request.body)
+        except queue.Full:
+            # تيليغرام سيعيد المحاولة لاحقًا
+            self.set_status(503)
+            return
+        self.set_status(200)
+
+
+def _worker_main(index: int, updates, workers: int):
+    # العملية الأم تتحكم بالإيقاف عبر رسالة None في الطابور (الإشارات تصل أحيانًا لكل المجموعة،
+    # مثل systemd أو Ctrl+C). لذلك لا يوقفها terminate() والبديل بعد DRAIN_TIMEOUT هو kill()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    logging.basicConfig(format=LOG_FORMAT, level=logging.INFO)
+    asyncio.run(_worker_loop(index, updates, workers))
+
+async def _worker_loop(index: int, updates, workers: int):
+    from telegram import Update
+    from . import outbox
+    from .bot import build_app
+    from .database import init_db
+
+    init_db()
+    outbox.share_rate(workers)
+    app = build_app(primary=index == 0, worker=index)
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    await app.start()
+    logger.info(f"Worker {index} ready")
+
+    loop = asyncio.get_running_loop()
+    while True:
+        raw = await loop.run_in_executor(None, updates.get)
+        if raw is None:
+            break
+        try:
+            await app.update_queue.put(Update.de_json(json.loads(raw), app.bot))
+        except Exception as e:
+            logger.warning(f"Worker {index} dropped malformed update: {e}")
+
+    # تفريغ ما تبقى ثم الإيقاف
+    await app.update_queue.join()
+    await app.stop()
+    if app.post_stop:
+        await app.post_stop(app)
+    await app.shutdown()
+    if app.post_shutdown:
+        await app.post_shutdown(app)
+    logger.info(f"Worker {index} drained")
+
+
+async def _front(queues, listen: str, port: int, url_path: str, webhook_url: str, secret: str):
+    from telegram import Bot
+    from .config import BOT_TOKEN, BOT_API_URL
+
+    if webhook_url:
+        kwargs = {"base_url": f"{BOT_API_URL}/bot"} if BOT_API_URL else {}
+        async with Bot(BOT_TOKEN, **kwargs) as bot:
+            await bot.set_webhook(url=webhook_url, allowed_updates=ALLOWED_UPDATES, secret_token=secret or None)
+
+    web = WebApplication([(rf"/{url_path}/?", WebhookHandler, {"queues": queues, "secret": secret})])
+    server = HTTPServer(web)
+    server.listen(port, address=listen)
+    logger.info(f"Webhook front listening on {listen}:{port} with {len(queues)} workers")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    # إيقاف الاستقبال أولًا ثم تفريغ العمليات
+    server.stop()
+    await server.close_all_connections()
+
+
+def serve(workers: int, listen: str, port: int, url_path: str, webhook_url: str = None, secret: str = ""):
+    ctx = multiprocessing.get_context("spawn")
+    queues = [ctx.Queue(QUEUE_SIZE) for _ in range(workers)]
+    procs = [
+        ctx.Process(target=_worker_main, args=(i, q, workers), name=f"bot-worker-{i}")
+        for i, q in enumerate(queues)
+    ]
+    for p in procs:
+        p.start()
+    try:
+        asyncio.run(_front(queues, listen, port, url_path, webhook_url, secret))
+    finally:
+        logger.info("Draining workers...")
+        for q in queues:
+            q.put(None)
+        for p in procs:
+            p.join(DRAIN_TIMEOUT)
+            if p.is_alive():
+                logger.error(f"{p.name} did not drain in {DRAIN_TIMEOUT}s, killing")
+                p.kill()
+                p.join()
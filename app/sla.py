@@ -0,0 +1,47 @@
+from .config import SLA_SECONDS
+from .migrations import ACTIVATION_BUCKETS
+
+# مستويات التذكير: مضاعفات وعد الرد، كل مستوى يُرسل مرة واحدة لكل طلب (orders.reminder_level)
+REMINDER_LEVELS = (1, 5, 15)
+
+
+def fmt_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m"
+    if seconds < 86400:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{seconds // 86400}d{seconds % 86400 // 3600}h"
+
+def fmt_bound(le) -> str:
+    if le is None:
+        return "-"
+    # الخانة الأخيرة مفتوحة (ما فوق يوم)
+    return f">{fmt_duration(ACTIVATION_BUCKETS[-2])}" if le >= ACTIVATION_BUCKETS[-1] else fmt_duration(le)
+
+def percentile(histogram, q: float):
+    # الحد الأعلى لأول خانة يبلغ عندها التراكم النسبة المطلوبة؛ None إن لم تُسجَّل تفعيلات
+    total = sum(count for _, count in histogram)
+    if not total:
+        return None
+    seen = 0
+    for le, count in histogram:
+        seen += count
+        if seen >= q * total:
+            return le
+    return histogram[-1][0]
+
+def within(histogram, seconds: float):
+    # نسبة التفعيلات في الخانات التي لا يتجاوز حدها الأعلى الوعد (تقدير أدنى)
+    total = sum(count for _, count in histogram)
+    if not total:
+        return None
+    return 100 * sum(count for le, count in histogram if le <= seconds) / total
+
+def reminder_thresholds():
+    # (المستوى, العمر بالثواني) من الأعلى للأدنى: الطلب القديم جدًا يصله التذكير الأشد مباشرة
+    if SLA_SECONDS <= 0:
+        return []
+    return [(level, SLA_SECONDS * factor) for level, factor in reversed(list(enumerate(REMINDER_LEVELS, 1)))]
@@ -1,88 +1,82 @@
 from typing import Optional, List, Dict
-from app.db import get_conn
+from app.database import get_conn, ORDER_SELECT, order_from_row
+from app.metrics import timed_query
 
+# مستودع طلبات الدفع والمستخدمين فوق نفس الاتصال والمخطط في app/database.py
+
+@timed_query
 def ensure_user(user_id: int, username: Optional[str], chat_id: Optional[int]) -> None:
     conn = get_conn()
-    c = conn.cursor()
-    c.execute("SELECT id FROM users WHERE id = ?", (user_id,))
-    if not c.fetchone():
-        c.execute("INSERT INTO users (id, username, chat_id) VALUES (?, ?, ?)", (user_id, username, chat_id))
-    else:
-        c.execute("UPDATE users SET username = ?, chat_id = ? WHERE id = ?", (username, chat_id, user_id))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute("""
+            INSERT INTO users (id, username, chat_id) VALUES (?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET username = excluded.username, chat_id = excluded.chat_id
+        """, (user_id, username, chat_id))
 
+@timed_query
 def set_user_role(user_id: int, role: str) -> None:
     conn = get_conn()
-    c = conn.cursor()
-    c.execute("UPDATE users SET role = ? WHERE id = ?", (role, user_id))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute("UPDATE users SET role = ? WHERE id = ?", (role, user_id))
 
+@timed_query
 def link_phone(user_id: int, phone: str) -> None:
     conn = get_conn()
-    c = conn.cursor()
-    c.execute("UPDATE users SET phone = ?, is_verified = 1 WHERE id = ?", (phone, user_id))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute("UPDATE users SET phone = ?, is_verified = 1 WHERE id = ?", (phone, user_id))
 
+@timed_query
 def create_order(user_id: int, to_phone: str, amount: float, fee: float = 0) -> int:
     conn = get_conn()
-    c = conn.cursor()
-    c.execute("""
-        INSERT INTO orders (user_id, to_phone, amount, fee, status)
-        VALUES (?, ?, ?, ?, 'PENDING')
-    """, (user_id, to_phone, amount, fee))
-    order_id = c.lastrowid
-    conn.commit()
-    conn.close()
-    return order_id
+    with conn:
+        c = conn.execute("""
+            INSERT INTO orders (kind, user_id, to_phone, amount, fee, status)
+            VALUES ('payment', ?, ?, ?, ?, 'pending')
+        """, (user_id, to_phone, amount, fee))
+    return c.lastrowid
 
-def list_orders(status: Optional[str] = None, limit: int = 20) -> List[Dict]:
-    conn = get_conn()
-    c = conn.cursor()
+@timed_query
+def page_orders(status: Optional[str] = None, user_id: Optional[int] = None,
+                before_id: Optional[int] = None, after_id: Optional[int] = None, limit: int = 20) -> List[Dict]:
+    # ترقيم Keyset: كل صفحة بحث واحد في الفهرس (status, id) أو (user_id, id) بدل OFFSET.
+    # before_id = الصفحة الأقدم، after_id = الصفحة الأحدث؛ النتيجة دائمًا من الأحدث للأقدم
+    where, params = [], []
     if status:
-        c.execute("""
-            SELECT id, user_id, to_phone, amount, fee, status, created_at
-            FROM orders WHERE status = ? ORDER BY id DESC LIMIT ?
-        """, (status, limit))
+        where.append("status = ?")
+        params.append(status.lower())
+    if user_id is not None:
+        where.append("user_id = ?")
+        params.append(user_id)
+    if after_id is not None:
+        where.append("id > ?")
+        params.append(after_id)
+        order = "ASC"
     else:
-        c.execute("""
-            SELECT id, user_id, to_phone, amount, fee, status, created_at
-            FROM orders ORDER BY id DESC LIMIT ?
-        """, (limit,))
-    rows = c.fetchall()
-    conn.close()
-    return [
-        {
-            "id": r[0], "user_id": r[1], "to_phone": r[2], "amount": r[3],
-            "fee": r[4], "status": r[5], "created_at": r[6]
-        } for r in rows
-    ]
+        if before_id is not None:
+            where.append("id < ?")
+            params.append(before_id)
+        order = "DESC"
+    sql = ORDER_SELECT
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    rows = get_conn().execute(f"{sql} ORDER BY id {order} LIMIT ?", (*params, limit)).fetchall()
+    if order == "ASC":
+        rows.reverse()
+    return [order_from_row(r) for r in rows]
 
-def list_user_orders(user_id: int, limit: int = 20) -> List[Dict]:
-    conn = get_conn()
-    c = conn.cursor()
-    c.execute("""
-        SELECT id, user_id, to_phone, amount, fee, status, created_at
-        FROM orders WHERE user_id = ? ORDER BY id DESC LIMIT ?
-    """, (user_id, limit))
-    rows = c.fetchall()
-    conn.close()
-    return [
-        {
-            "id": r[0], "user_id": r[1], "to_phone": r[2], "amount": r[3],
-            "fee": r[4], "status": r[5], "created_at": r[6]
-        } for r in rows
-    ]
+@timed_query
+def list_orders(status: Optional[str] = None, limit: int = 20, before_id: Optional[int] = None) -> List[Dict]:
+    return page_orders(status=status, before_id=before_id, limit=limit)
+
+@timed_query
+def list_user_orders(user_id: int, limit: int = 20, before_id: Optional[int] = None) -> List[Dict]:
+    return page_orders(user_id=user_id, before_id=before_id, limit=limit)
 
+@timed_query
 def update_order_status(order_id: int, status: str, note: Optional[str] = None) -> bool:
     conn = get_conn()
-    c = conn.cursor()
-    c.execute("""
-        UPDATE orders SET status = ?, note = ?, updated_at = datetime('now') WHERE id = ?
-    """, (status, note, order_id))
-    conn.commit()
-    ok = c.rowcount > 0
-    conn.close()
-    return ok
+    with conn:
+        c = conn.execute("""
+            UPDATE orders SET status = ?, note = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?
+        """, (status.lower(), note, order_id))
+    return c.rowcount > 0
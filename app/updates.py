@@ -0,0 +1,72 @@
+import asyncio
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+class ChatOrderedProcessor(BaseUpdateProcessor):
+    # معالجة متزامنة حتى max_concurrent_updates تحديث، وبالترتيب داخل المحادثة الواحدة:
+    # تحديثات نفس المحادثة تنتظر قفلها، فلا يقف مستخدم خلف كتابة بطيئة لمستخدم آخر
+    # per_message_chats: محادثات (مثل محادثة التاجر) تُرتَّب ضغطات أزرارها لكل رسالة لا للمحادثة كلها،
+    # فلا يقف تفعيل طلب خلف تفعيل طلب آخر؛ إجراءات الطلبات مشروطة بالحالة في القاعدة
+    def __init__(self, max_concurrent_updates: int, per_message_chats=()):
+        super().__init__(max_concurrent_updates)
+        self.per_message_chats = frozenset(per_message_chats)
+        self._locks = {}
+        self._pending = 0
+        self._running = 0
+
+    def _key(self, update):
+        if isinstance(update, Update):
+            query = update.callback_query
+            if query and query.message and query.message.chat.id in self.per_message_chats:
+                return query.message.chat.id, query.message.message_id
+            if update.effective_chat:
+                return update.effective_chat.id
+            if update.effective_user:
+                return update.effective_user.id
+        return None
+
+    def backlog(self) -> int:
+        # تحديثات استُلمت ولم تبدأ معالجتها بعد (تنتظر قفل محادثتها أو مكانًا شاغرًا)
+        return self._pending - self._running
+
+    async def process_update(self, update, coroutine):
+        # قفل المحادثة أولًا ثم مكان من max_concurrent_updates: التحديثات المنتظرة خلف محادثتها
+        # لا تحجز أماكن، فلا تعطّل محادثة تُغرق البوت بقية المستخدمين
+        key = self._key(update)
+        self._pending += 1
+        try:
+            if key is None:
+                await self._run(update, coroutine)
+                return
+            # قفل لكل محادثة نشطة مع عدّاد انتظار؛ يُحذف عند آخر تحديث فيبقى القاموس بحجم المحادثات النشطة
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [asyncio.Lock(), 0]
+            entry[1] += 1
+            try:
+                async with entry[0]:
+                    await self._run(update, coroutine)
+            finally:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
+        finally:
+            self._pending -= 1
+
+    async def _run(self, update, coroutine):
+        async with self._semaphore:
+            self._running += 1
+            try:
+                await self.do_process_update(update, coroutine)
+            finally:
+                self._running -= 1
+
+    async def do_process_update(self, update, coroutine):
+        await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
@@ -0,0 +1,61 @@
+import asyncio
+import logging
+from . import async_db as db
+
+logger = logging.getLogger(__name__)
+
+# تخزين مؤقت لإدراجات الزوار/المشتركين: المستخدم المعروف يُتجاهل،
+# والجديد يُجمع ويُكتب دفعة واحدة (executemany) كل FLUSH_INTERVAL ثانية أو عند FLUSH_SIZE
+FLUSH_INTERVAL = 5
+FLUSH_SIZE = 200
+MAX_KNOWN = 500_000
+
+_known = {"visitors": set(), "subscribers": set()}
+_pending = {"visitors": set(), "subscribers": set()}
+_writers = {"visitors": db.add_visitors, "subscribers": db.add_subscribers}
+_lock = asyncio.Lock()
+_flush_task = None
+
+
+def _note(table: str, user_id: int) -> bool:
+    known = _known[table]
+    if user_id in known:
+        return False
+    if len(known) >= MAX_KNOWN:
+        known.clear()
+    known.add(user_id)
+    _pending[table].add(user_id)
+    if len(_pending[table]) >= FLUSH_SIZE:
+        _schedule_flush()
+    return True
+
+def note_visitor(user_id: int) -> bool:
+    return _note("visitors", user_id)
+
+def note_subscriber(user_id: int) -> bool:
+    return _note("subscribers", user_id)
+
+def pending_count() -> int:
+    return sum(len(p) for p in _pending.values())
+
+def _schedule_flush():
+    global _flush_task
+    if _flush_task is None or _flush_task.done():
+        _flush_task = asyncio.get_running_loop().create_task(flush())
+
+async def flush() -> int:
+    # يعيد عدد الصفوف الجديدة التي أُضيفت فعلاً
+    added = 0
+    async with _lock:
+        for table, pending in _pending.items():
+            if not pending:
+                continue
+            batch = list(pending)
+            pending.clear()
+            try:
+                added += await _writers[table](batch)
+            except Exception as e:
+                # إعادة الدفعة للانتظار حتى لا يضيع أي مستخدم
+                pending.update(batch)
+                logger.warning(f"Write-behind flush for {table} failed: {e}")
+    return added
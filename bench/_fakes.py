@@ -0,0 +1,84 @@
+# كائنات وهمية خفيفة تحاكي Update/Context لتشغيل المعالجات دون شبكة
+import asyncio
+from types import SimpleNamespace
+
+
+UPLOAD_BPS = 1_000_000  # سرعة رفع وهمية (بايت/ثانية) لمحاكاة رفع الملفات
+
+
+class FakeMessage:
+    _next_id = 1
+
+    def __init__(self, chat_id, text=None, photo=None, document=None, latency=0.0):
+        self.chat_id = chat_id
+        self.text = text
+        self.photo = photo or []
+        self.document = document
+        self.latency = latency
+        self.uploaded = 0
+        self.message_id = FakeMessage._next_id
+        FakeMessage._next_id += 1
+        self.sent = []
+
+    async def _reply(self, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.sent.append(kwargs)
+        return FakeMessage(self.chat_id)
+
+    async def reply_text(self, text, **kwargs):
+        return await self._reply(text=text, **kwargs)
+
+    async def reply_photo(self, photo, **kwargs):
+        if hasattr(photo, "read"):
+            data = photo.read()
+            self.uploaded += len(data)
+            await asyncio.sleep(len(data) / UPLOAD_BPS)
+        reply = await self._reply(photo=photo, **kwargs)
+        reply.photo = [SimpleNamespace(file_id=f"photo-{len(self.sent)}", file_unique_id="qr")]
+        return reply
+
+    async def delete(self):
+        return True
+
+
+class FakeBot:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+
+    async def _call(self, chat_id=None, **kwargs):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return FakeMessage(chat_id)
+
+    send_message = _call
+    send_photo = _call
+    send_document = _call
+    send_media_group = _call
+    delete_message = _call
+
+    async def get_file(self, file_id):
+        await self._call()
+        return FakeFile(file_id)
+
+
+class FakeFile:
+    def __init__(self, file_id):
+        self.file_id = file_id
+
+    async def download_to_drive(self, path):
+        path.write_bytes(b"\xff\xd8" + self.file_id.encode() * 1000)
+        return path
+
+
+def make_update(user_id, text=None, photo=None):
+    user = SimpleNamespace(id=user_id, full_name=f"user {user_id}")
+    message = FakeMessage(user_id, text=text, photo=photo)
+    return SimpleNamespace(effective_user=user, effective_chat=SimpleNamespace(id=user_id), message=message)
+
+
+def make_context(bot, user_data=None):
+    application = SimpleNamespace(create_task=asyncio.ensure_future)
+    return SimpleNamespace(bot=bot, user_data={} if user_data is None else user_data, application=application)
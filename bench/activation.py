@@ -0,0 +1,101 @@
+# زمن الضغط على "إرسال كود التفعيل" من وصول التحديث حتى انتهاء المعالج، مع Bot API وهمي بتأخير ثابت:
+# التسلسل القديم (قراءتان للطلب وكل الاستدعاءات بالتتابع) مقابل كاش الطلبات والاستدعاءات المتوازية
+# التشغيل: python -m bench.activation [عدد الطلبات] [تأخير API بالثواني]
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from app import database, async_db, handlers, order_cache, outbox, replies
+from app.config import MERCHANT_ID
+from app.metrics import DB_SECONDS
+from app.utils import generate_activation_code, final_report
+from bench._fakes import FakeBot, FakeMessage
+
+
+class FakeQuery:
+    def __init__(self, data, bot):
+        self.data = data
+        self.bot = bot
+        self.from_user = SimpleNamespace(id=MERCHANT_ID, language_code="ar")
+        self.message = FakeMessage(MERCHANT_ID, latency=bot.latency)
+        self.message.delete = self._delete
+
+    async def answer(self, text=None):
+        await self.bot._call()
+
+    async def _delete(self):
+        await self.bot._call()
+
+
+async def legacy_activate(query, context, order_id):
+    # نسخة مطابقة لمسار activate قبل التعديل
+    await query.answer()
+    order = await async_db.run(database.get_order, order_id)
+    code = generate_activation_code(order["device_id"])
+    await async_db.run(database.update_order, order_id, activation_code=code, status="done")
+    await context.bot.send_message(chat_id=order["user_id"], text=replies.text("activation_code", code=code))
+    report = final_report(order_id, await async_db.run(database.get_order, order_id))
+    outbox.enqueue(MERCHANT_ID, replies.text("final_report_merchant", report=report))
+    await context.bot.send_message(chat_id=order["user_id"], text=replies.text("final_report_user", report=report))
+    await context.bot.delete_message(chat_id=MERCHANT_ID, message_id=order["team_msg_id"])
+    await query.message.delete()
+
+
+async def current_activate(query, context, order_id):
+    await handlers.team_action(SimpleNamespace(callback_query=query, effective_user=query.from_user), context)
+
+
+def db_calls():
+    return sum(sum(counts) for counts, _ in DB_SECONDS._series.values())
+
+
+async def run(label, handler, orders, latency, warm):
+    bot = FakeBot(latency=latency)
+    context = SimpleNamespace(bot=bot, user_data={})
+    if warm:
+        # الحالة الواقعية: الطلب قُرئ للتو عند send_team فهو في الكاش
+        for order_id in orders:
+            await async_db.get_order(order_id)
+    timings = []
+    calls0, db0 = bot.calls, db_calls()
+    for order_id in orders:
+        query = FakeQuery(f"activate:{order_id}", bot)
+        t0 = time.perf_counter()
+        await handler(query, context, order_id)
+        timings.append(time.perf_counter() - t0)
+    timings.sort()
+    n = len(orders)
+    print(
+        f"{label:<22} p50={timings[n // 2] * 1000:7.2f}ms  p95={timings[int(n * 0.95)] * 1000:7.2f}ms  "
+        f"api calls/op={(bot.calls - calls0) / n:4.1f}  db calls/op={(db_calls() - db0) / n:4.1f}"
+    )
+
+
+def seed(n):
+    ids = []
+    for i in range(n):
+        order_id = database.add_order(1000 + i, f"0f8fad5b-d9cb-469f-a165-{i:012d}", "paid")
+        database.update_order(order_id, team_msg_id=500 + i)
+        ids.append(order_id)
+    return ids
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.03
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = Path(tmp) / "bench.db"
+        database.init_db()
+        asyncio.run(run("sequential (before)", legacy_activate, seed(n), latency, warm=False))
+        order_cache.clear()
+        asyncio.run(run("cached+gather (cold)", current_activate, seed(n), latency, warm=False))
+        asyncio.run(run("cached+gather (warm)", current_activate, seed(n), latency, warm=True))
+        async_db.shutdown()
+        database.close_conn()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# قياس محرك الإرسال الجماعي دون شبكة باستخدام Bot وهمي
+# يرفض البوت الوهمي بعض الطلبات بـ RetryAfter لاختبار إعادة المحاولة
+# التشغيل: python -m bench.broadcast [عدد المشتركين] [حد الإرسال/ثانية]
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from telegram.error import RetryAfter
+
+from app import database, async_db, broadcast
+from bench._fakes import FakeBot
+
+
+class FlakyBot(FakeBot):
+    def __init__(self, latency=0.03, retry_ratio=0.002):
+        super().__init__(latency)
+        self.retry_ratio = retry_ratio
+        self.retries = 0
+
+    async def send_message(self, chat_id=None, **kwargs):
+        if random.random() < self.retry_ratio:
+            self.retries += 1
+            raise RetryAfter(1)
+        return await self._call(chat_id, **kwargs)
+
+    async def edit_message_text(self, **kwargs):
+        print("   ", kwargs["text"].replace("\n", " | "))
+
+
+async def run(subscribers):
+    bot = FlakyBot()
+    database.add_subscribers(range(1, subscribers + 1))
+    broadcast_id = await broadcast.start_broadcast(bot, "bench", report_chat_id=0)
+    b = await async_db.get_broadcast(broadcast_id)
+    t0 = time.perf_counter()
+    stats = await broadcast.run_broadcast(bot, broadcast_id, broadcast.message_reporter(bot, b))
+    dt = time.perf_counter() - t0
+    print(f"sent={stats.sent} failed={stats.failed} retries={bot.retries} in {dt:.1f}s -> {stats.sent / dt:.0f} msg/s")
+
+
+def main():
+    subscribers = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    broadcast.GLOBAL_RATE = float(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    broadcast.REPORT_INTERVAL = 1
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = Path(tmp) / "bench.db"
+        database.init_db()
+        asyncio.run(run(subscribers))
+        async_db.shutdown()
+        database.close_conn()
+
+
+if __name__ == "__main__":
+    main()
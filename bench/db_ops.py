@@ -0,0 +1,52 @@
+# قياس عدد العمليات في الثانية لطبقة قاعدة البيانات: اتصال لكل عملية (القديم) مقابل الاتصال الدائم
+# التشغيل: python -m bench.db_ops [عدد العمليات]
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app import database
+
+
+def legacy_add_visitor(user_id: int):
+    conn = sqlite3.connect(database.DB_PATH)
+    cur = conn.cursor()
+    cur.execute("INSERT OR IGNORE INTO visitors (user_id) VALUES (?)", (user_id,))
+    conn.commit()
+    conn.close()
+
+
+def legacy_get_order(order_id: int):
+    conn = sqlite3.connect(database.DB_PATH)
+    cur = conn.cursor()
+    cur.execute("SELECT * FROM orders WHERE id=?", (order_id,))
+    row = cur.fetchone()
+    conn.close()
+    return row
+
+
+def run(label, fn, n):
+    t0 = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    dt = time.perf_counter() - t0
+    print(f"{label:<28} {n / dt:>10.0f} ops/s")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = Path(tmp) / "bench.db"
+        database.init_db()
+        oid = database.add_order(1, "dev", "bench")
+
+        run("add_visitor (before)", lambda i: legacy_add_visitor(i), n)
+        run("add_visitor (after)", lambda i: database.add_visitor(n + i), n)
+        run("get_order (before)", lambda i: legacy_get_order(oid), n)
+        run("get_order (after)", lambda i: database.get_order(oid), n)
+        database.close_conn()
+
+
+if __name__ == "__main__":
+    main()
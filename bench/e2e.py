@@ -0,0 +1,188 @@
+# اختبار شامل لمسار التحديثات: التطبيق الحقيقي من build_app مع معالجات app/handlers.py
+# وBot API وهمي عبر HTTP داخل نفس العملية. كل مستخدم يمر بالمسار كاملًا:
+# /start ← رمز الجهاز ← صورة الإشعار ← إرسال للتاجر ← التفعيل (من التاجر)
+# التقرير: تحديثات/ثانية، p50/p95/p99 لكل مرحلة، عمليات القاعدة واستدعاءات API لكل تحديث.
+# الإخراج بصيغة ثابتة (و--json) للمقارنة بين الـ commits.
+# التشغيل: python -m bench.e2e [--users N] [--concurrency C] [--latency S] [--record F | --replay F] [--json F]
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+MERCHANT = 1
+TOKEN = "123456:e2e"
+STAGES = ["start", "device", "proof", "send_team", "activate"]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def synthetic_flow(uid):
+    # {order_id} يُستبدل وقت التشغيل بالطلب الذي أنشأه هذا المستخدم
+    chat = {"id": uid, "type": "private"}
+    sender = {"id": uid, "is_bot": False, "first_name": f"u{uid}", "language_code": "ar"}
+    merchant = {"id": MERCHANT, "is_bot": False, "first_name": "merchant"}
+    message = lambda **kw: {"message_id": 1, "date": 0, "chat": chat, "from": sender, **kw}
+    callback = lambda frm, data, chat_id: {
+        "id": f"{uid}-{data}", "from": frm, "chat_instance": "x", "data": data,
+        "message": {"message_id": uid, "date": 0, "chat": {"id": chat_id, "type": "private"}},
+    }
+    return [
+        ("start", {"message": message(text="/start", entities=[{"type": "bot_command", "offset": 0, "length": 6}])}),
+        ("device", {"message": message(text=f"0f8fad5b-d9cb-469f-a165-{uid:012d}")}),
+        ("proof", {"message": message(photo=[{"file_id": f"proof-{uid}", "file_unique_id": f"u{uid}", "width": 1, "height": 1}])}),
+        ("send_team", {"callback_query": callback(sender, "send_team:{order_id}", uid)}),
+        ("activate", {"callback_query": callback(merchant, "activate:{order_id}", MERCHANT)}),
+    ]
+
+
+def load_flows(path):
+    # سطر لكل تحديث: {"user": .., "stage": .., "update": {...}} بترتيب المسار لكل مستخدم
+    flows = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                flows.setdefault(row["user"], []).append((row["stage"], row["update"]))
+    return flows
+
+
+def record_flows(path, flows):
+    with open(path, "w", encoding="utf-8") as f:
+        for uid, steps in flows.items():
+            for stage, update in steps:
+                f.write(json.dumps({"user": uid, "stage": stage, "update": update}, ensure_ascii=False) + "\n")
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] * 1000 if values else 0.0
+
+
+async def run(args, flows):
+    from telegram import Update
+    from telegram.ext import TypeHandler
+    from bench import fake_bot_api
+    from app import bot as bot_module, outbox
+    from app.metrics import DB_SECONDS
+    from app.ratelimit import KeyedLimiter
+
+    api = fake_bot_api.make_app(args.latency).listen(int(os.environ["_API_PORT"]), address="127.0.0.1")
+    # حد تيليغرام لكل محادثة (رسالة/ثانية) يُرفع هنا: نقيس كلفة المسار لا انتظار الحد
+    outbox._limiter = KeyedLimiter(1e9, 1e9)
+
+    app = bot_module.build_app(customer_flow=True)
+    done = {}
+
+    async def mark_done(update, context):
+        future = done.pop(update.update_id, None)
+        if future and not future.done():
+            future.set_result(time.perf_counter())
+
+    # آخر مجموعة: تُنفذ بعد انتهاء معالج التحديث
+    app.add_handler(TypeHandler(Update, mark_done), group=99)
+
+    await app.initialize()
+    await app.post_init(app)
+    await app.start()
+
+    db_calls = lambda: sum(sum(counts) for counts, _ in DB_SECONDS._series.values())
+    api_calls = lambda: sum(v for k, v in fake_bot_api.Stats.calls.items() if k not in ("getMe", "setWebhook"))
+    db0, api0 = db_calls(), api_calls()
+    latencies = {stage: [] for stage in STAGES}
+    next_id = iter(range(1, 10**9))
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def user_flow(uid, steps):
+        # send_team يمسح user_data، فيُحفظ رقم الطلب بعد كل مرحلة لمرحلة التفعيل
+        order_id = 0
+        async with semaphore:
+            for stage, raw in steps:
+                raw = json.loads(json.dumps(raw).replace("{order_id}", str(order_id)))
+                update_id = next(next_id)
+                update = Update.de_json({"update_id": update_id, **raw}, app.bot)
+                future = done[update_id] = asyncio.get_running_loop().create_future()
+                t0 = time.perf_counter()
+                await app.update_queue.put(update)
+                latencies[stage].append(await future - t0)
+                order_id = app.user_data[uid].get("order_id", order_id)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(user_flow(uid, steps) for uid, steps in flows.items()))
+    elapsed = time.perf_counter() - t0
+    # نفس ترتيب الإيقاف في run_webhook؛ post_stop يفرغ طابور الإرسال والكتابات المؤجلة
+    # فتُحسب ضمن كلفة التحديثات
+    await app.stop()
+    await app.post_stop(app)
+    await app.shutdown()
+    await app.post_shutdown(app)
+    api.stop()
+
+    updates = sum(len(v) for v in latencies.values())
+    return {
+        "users": len(flows),
+        "updates": updates,
+        "updates_per_s": updates / elapsed,
+        "db_ops_per_update": (db_calls() - db0) / updates,
+        "api_calls_per_update": (api_calls() - api0) / updates,
+        "api_calls": {k: v for k, v in sorted(fake_bot_api.Stats.calls.items())},
+        "stages": {
+            stage: {"n": len(v), "p50_ms": pct(v, 50), "p95_ms": pct(v, 95), "p99_ms": pct(v, 99)}
+            for stage, v in latencies.items() if v
+        },
+    }
+
+
+def print_report(result):
+    print(f"users={result['users']} updates={result['updates']}")
+    print(f"updates/s            {result['updates_per_s']:10.1f}")
+    print(f"db ops/update        {result['db_ops_per_update']:10.2f}")
+    print(f"api calls/update     {result['api_calls_per_update']:10.2f}")
+    print(f"{'stage':<12} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for stage, s in result["stages"].items():
+        print(f"{stage:<12} {s['n']:>6} {s['p50_ms']:>9.2f} {s['p95_ms']:>9.2f} {s['p99_ms']:>9.2f}")
+    print("api calls: " + ", ".join(f"{k}={v}" for k, v in result["api_calls"].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02, help="تأخير Bot API الوهمي بالثواني")
+    parser.add_argument("--record", help="حفظ التحديثات المولدة في ملف JSONL")
+    parser.add_argument("--replay", help="إعادة تشغيل تحديثات مسجلة من ملف JSONL")
+    parser.add_argument("--json", help="حفظ النتيجة بصيغة JSON للمقارنة")
+    args = parser.parse_args()
+
+    flows = load_flows(args.replay) if args.replay else {1000 + i: synthetic_flow(1000 + i) for i in range(args.users)}
+    if args.record:
+        record_flows(args.record, flows)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # الإعدادات تُقرأ عند الاستيراد: البيئة تُضبط قبل استيراد app
+        api_port = free_port()
+        os.environ.update({
+            "DB_PATH": str(Path(tmp) / "e2e.db"), "PROOF_DIR": str(Path(tmp) / "proofs"),
+            "ARCHIVE_DIR": str(Path(tmp) / "archive"), "BOT_TOKEN": TOKEN, "MERCHANT_ID": str(MERCHANT),
+            "BOT_API_URL": f"http://127.0.0.1:{api_port}", "PING_PORT": str(free_port()), "_API_PORT": str(api_port),
+        })
+        from app.database import init_db
+        init_db()
+        result = asyncio.run(run(args, flows))
+
+    print_report(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+# محادثة تُغرق البوت لا تؤخر محادثة أخرى: ChatOrderedProcessor بعدد أماكن قليل،
+# المحادثة A ترسل دفعة تحديثات بطيئة ثم المحادثة B تحديثًا واحدًا؛ زمن B يجب أن يبقى قريبًا من زمن معالجته
+# التشغيل: python -m bench.fairness [عدد الأماكن] [حجم الدفعة] [زمن التحديث بالثواني]
+import asyncio
+import sys
+import time
+
+from telegram import Chat, Message, Update
+
+from app.updates import ChatOrderedProcessor
+
+
+def make_update(update_id, chat_id):
+    message = Message(update_id, None, Chat(chat_id, "private"), text="x")
+    return Update(update_id, message=message)
+
+
+async def handle(duration):
+    await asyncio.sleep(duration)
+
+
+async def run(slots, burst, duration):
+    processor = ChatOrderedProcessor(slots)
+    flood = [
+        asyncio.create_task(processor.process_update(make_update(i, 1), handle(duration)))
+        for i in range(burst)
+    ]
+    await asyncio.sleep(0)
+    backlog = processor.backlog()
+    t0 = time.perf_counter()
+    await processor.process_update(make_update(burst, 2), handle(duration))
+    other = time.perf_counter() - t0
+    await asyncio.gather(*flood)
+    print(f"slots={slots} burst={burst} handler={duration * 1000:.0f}ms  "
+          f"backlog={backlog}  unrelated chat={other * 1000:.0f}ms")
+    assert other < duration * 2, f"unrelated chat waited {other:.2f}s behind the flood"
+
+
+def main():
+    slots = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    burst = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    duration = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+    asyncio.run(run(slots, burst, duration))
+
+
+if __name__ == "__main__":
+    main()
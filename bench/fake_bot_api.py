@@ -0,0 +1,93 @@
+# خادم محلي يحاكي Bot API لتيليغرام (ردود ثابتة مع تأخير شبكة وهمي) لاختبارات الحمل
+# التشغيل: python -m bench.fake_bot_api [المنفذ] [التأخير بالثواني]
+import asyncio
+import itertools
+import json
+import sys
+import time
+
+from tornado.web import Application, RequestHandler
+
+FILE_SIZE = 64 * 1024
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot"}
+
+
+class Stats:
+    calls = {}
+    last_call = 0.0
+
+
+class MethodHandler(RequestHandler):
+    message_ids = itertools.count(1)
+
+    def initialize(self, latency):
+        self.latency = latency
+
+    def _param(self, name, default=None):
+        if self.request.headers.get("Content-Type", "").startswith("application/json"):
+            return json.loads(self.request.body or b"{}").get(name, default)
+        return self.get_argument(name, default)
+
+    async def post(self, token, method):
+        Stats.calls[method] = Stats.calls.get(method, 0) + 1
+        Stats.last_call = time.time()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method == "getMe":
+            result = BOT_USER
+        elif method in ("sendMessage", "sendPhoto", "sendDocument", "editMessageText"):
+            chat_id = int(self._param("chat_id", 0) or 0)
+            result = {
+                "message_id": next(self.message_ids), "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"}, "text": self._param("text", ""),
+            }
+            if method == "sendPhoto":
+                result["photo"] = [{"file_id": "fake-photo", "file_unique_id": "fake", "width": 1, "height": 1}]
+        elif method == "sendMediaGroup":
+            chat_id = int(self._param("chat_id", 0) or 0)
+            media = json.loads(self._param("media", "[]"))
+            result = [
+                {"message_id": next(self.message_ids), "date": int(time.time()), "chat": {"id": chat_id, "type": "private"}}
+                for _ in media
+            ]
+        elif method == "getFile":
+            file_id = self._param("file_id", "")
+            result = {"file_id": file_id, "file_unique_id": file_id[-16:], "file_size": FILE_SIZE,
+                      "file_path": f"photos/{file_id}.jpg"}
+        else:
+            result = True
+        self.write({"ok": True, "result": result})
+
+    get = post
+
+
+class FileHandler(RequestHandler):
+    def get(self, token, path):
+        Stats.calls["download"] = Stats.calls.get("download", 0) + 1
+        self.write(b"\xff\xd8" + b"\0" * (FILE_SIZE - 2))
+
+
+class StatsHandler(RequestHandler):
+    def get(self):
+        self.write({"calls": Stats.calls, "last_call": Stats.last_call})
+
+    def delete(self):
+        Stats.calls = {}
+
+
+def make_app(latency: float = 0.02):
+    return Application([
+        (r"/stats", StatsHandler),
+        (r"/bot([^/]+)/(\w+)", MethodHandler, {"latency": latency}),
+        (r"/file/bot([^/]+)/(.+)", FileHandler),
+    ])
+
+
+async def main(port: int, latency: float):
+    make_app(latency).listen(port, address="127.0.0.1")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 8081,
+                     float(sys.argv[2]) if len(sys.argv) > 2 else 0.02))
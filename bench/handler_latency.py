@@ -0,0 +1,151 @@
+# اختبار حمل: زمن معالجة التحديثات (p50/p99) عبر التطبيق الحقيقي (build_app) مع مستخدمين متزامنين
+# وBot API وهمي بتأخير شبكة، مرة مع استدعاء قاعدة البيانات مباشرة داخل الحلقة (القديم) ومرة عبر async_db.
+# التحديثات تدخل من app.update_queue كما في bench/e2e.py، فتمر بمعالج التحديثات المتزامن (ChatOrderedProcessor).
+# يُقاس الزمن من لحظة وصول التحديث حتى انتهاء معالجته، مع أكبر تأخر لحلقة الأحداث.
+# كل استدعاء للقاعدة يتأخر FSYNC_DELAY (كقرص بطيء): في الوضع القديم يوقف الحلقة وكل المستخدمين معها.
+# التشغيل: python -m bench.handler_latency [عدد المستخدمين] [تحديثات/ثانية] [تأخير القرص بالثواني]
+import asyncio
+import itertools
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench.e2e import MERCHANT, TOKEN, free_port, pct
+
+FSYNC_DELAY = 0.005
+
+
+def _slow(fn, delay):
+    # تأخير يشبه fsync على قرص بطيء قبل كل استدعاء للقاعدة
+    def inner(*args, **kwargs):
+        time.sleep(delay)
+        return fn(*args, **kwargs)
+    return inner
+
+
+class _BlockingDB:
+    # نفس الواجهة لكن الاستدعاء (مع تأخير القرص) يتم داخل حلقة الأحداث مباشرة
+    def __init__(self, delay):
+        self.delay = delay
+
+    def __getattr__(self, name):
+        from app import database
+        fn = _slow(getattr(database, name), self.delay)
+
+        async def inner(*args, **kwargs):
+            return fn(*args, **kwargs)
+        return inner
+
+
+class _ThreadDB(_BlockingDB):
+    # نفس تأخير القرص لكن على Thread قاعدة البيانات (async_db.run)
+    def __getattr__(self, name):
+        from app import async_db, database
+        fn = _slow(getattr(database, name), self.delay)
+
+        async def inner(*args, **kwargs):
+            return await async_db.run(fn, *args, **kwargs)
+        return inner
+
+
+def text_update(update_id, uid, text):
+    chat = {"id": uid, "type": "private"}
+    sender = {"id": uid, "is_bot": False, "first_name": f"u{uid}"}
+    return {"update_id": update_id, "message": {"message_id": 1, "date": 0, "chat": chat, "from": sender, "text": text}}
+
+
+async def lag_probe(stop, lags):
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - t0 - 0.001)
+
+
+async def run_mode(app, label, first_uid, users, rate, update_ids):
+    from telegram import Update
+    # device: لا يلمس القاعدة (يتأخر فقط إن توقفت الحلقة)، payment: ينشئ الطلب (add_order)
+    latencies, lags = {"device": [], "payment": []}, []
+    done = app.bot_data["_done"]
+
+    async def user_flow(uid, arrival):
+        await asyncio.sleep(max(0.0, arrival - time.perf_counter()))
+        for step in latencies:
+            update_id = next(update_ids)
+            future = done[update_id] = asyncio.get_running_loop().create_future()
+            await app.update_queue.put(Update.de_json(text_update(update_id, uid, f"{step}-{uid}"), app.bot))
+            latencies[step].append(await future - arrival)
+            arrival = time.perf_counter()
+
+    stop = asyncio.Event()
+    probe = asyncio.create_task(lag_probe(stop, lags))
+    t0 = time.perf_counter()
+    await asyncio.gather(*(user_flow(first_uid + i, t0 + i / rate) for i in range(users)))
+    dt = time.perf_counter() - t0
+    stop.set()
+    await probe
+    updates = sum(len(v) for v in latencies.values())
+    print(f"{label:<10} updates/s={updates / dt:7.0f}  max loop lag={max(lags) * 1000:6.2f}ms")
+    for step, values in latencies.items():
+        print(f"  {step:<8} p50={pct(values, 50):7.2f}ms  p99={pct(values, 99):7.2f}ms")
+
+
+async def run(users, rate, delay):
+    from telegram import Update
+    from telegram.ext import TypeHandler
+    from bench import fake_bot_api
+    from app import bot as bot_module, async_db, handlers, outbox
+    from app.ratelimit import KeyedLimiter
+
+    api = fake_bot_api.make_app(0.02).listen(int(os.environ["_API_PORT"]), address="127.0.0.1")
+    # حد تيليغرام لكل محادثة يُرفع: نقيس كلفة المعالجة لا انتظار الحد
+    outbox._limiter = KeyedLimiter(1e9, 1e9)
+    app = bot_module.build_app(customer_flow=True)
+    done = app.bot_data["_done"] = {}
+
+    async def mark_done(update, context):
+        future = done.pop(update.update_id, None)
+        if future and not future.done():
+            future.set_result(time.perf_counter())
+
+    app.add_handler(TypeHandler(Update, mark_done), group=99)
+    await app.initialize()
+    await app.post_init(app)
+    await app.start()
+    print(f"concurrent updates: {app.update_processor.max_concurrent_updates}")
+
+    update_ids = itertools.count(1)
+    print(f"db call delay: {delay * 1000:.1f}ms")
+    handlers.db = _BlockingDB(delay)
+    await run_mode(app, "blocking", 10_000, users, rate, update_ids)
+    handlers.db = _ThreadDB(delay)
+    await run_mode(app, "async_db", 20_000, users, rate, update_ids)
+    handlers.db = async_db
+
+    await app.stop()
+    await app.post_stop(app)
+    await app.shutdown()
+    await app.post_shutdown(app)
+    api.stop()
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 500
+    delay = float(sys.argv[3]) if len(sys.argv) > 3 else FSYNC_DELAY
+    with tempfile.TemporaryDirectory() as tmp:
+        # الإعدادات تُقرأ عند الاستيراد: البيئة تُضبط قبل استيراد app
+        api_port = free_port()
+        os.environ.update({
+            "DB_PATH": str(Path(tmp) / "bench.db"), "PROOF_DIR": str(Path(tmp) / "proofs"),
+            "BOT_TOKEN": TOKEN, "MERCHANT_ID": str(MERCHANT), "BOT_API_URL": f"http://127.0.0.1:{api_port}",
+            "PING_PORT": str(free_port()), "_API_PORT": str(api_port),
+        })
+        from app.database import init_db
+        init_db()
+        asyncio.run(run(users, rate, delay))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# قياس الاستعلامات المتكررة على قاعدة اصطناعية كبيرة قبل فهارس الترحيل 2 وبعدها،
+# مع التحقق عبر EXPLAIN QUERY PLAN من أن كل استعلام يستخدم الفهرس المتوقع
+# بإحصاءات محدثة كما تتركها مهمة analyze_db الدورية
+# التشغيل: python -m bench.indexes [عدد الطلبات]
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app.database import analyze
+from app.migrations import migrate, explain
+
+QUERIES = [
+    ("orders by user", "SELECT id, status FROM orders WHERE user_id = ? ORDER BY id DESC LIMIT 20", (4242,),
+     "idx_orders_user_id"),
+    ("orders by status", "SELECT id, user_id FROM orders WHERE status = ? ORDER BY id DESC LIMIT 20", ("pending",),
+     "idx_orders_status_id"),
+    ("subscribers page", "SELECT user_id FROM subscribers ORDER BY first_seen ASC LIMIT 100 OFFSET 1000", (),
+     "idx_subscribers_first_seen"),
+    # دفعات الإرسال الجماعي (get_subscribers_after)
+    ("subscribers keyset", "SELECT user_id FROM subscribers WHERE user_id > ? ORDER BY user_id LIMIT ?", (100_000, 500),
+     "INTEGER PRIMARY KEY"),
+    # صفحات /orders (storage.page_orders): الكل، حسب الحالة، حسب المستخدم، والصفحة الأحدث
+    ("/orders all", "SELECT id, status FROM orders WHERE id < ? ORDER BY id DESC LIMIT 11", (1_000_000,),
+     "INTEGER PRIMARY KEY"),
+    ("/orders status", "SELECT id, user_id FROM orders WHERE status = ? AND id < ? ORDER BY id DESC LIMIT 11",
+     ("pending", 1_000_000), "idx_orders_status_id"),
+    ("/orders user", "SELECT id, status FROM orders WHERE user_id = ? AND id < ? ORDER BY id DESC LIMIT 11",
+     (4242, 1_000_000), "idx_orders_user_id"),
+    ("/orders newer", "SELECT id, user_id FROM orders WHERE status = ? AND id > ? ORDER BY id ASC LIMIT 11",
+     ("pending", 1_000), "idx_orders_status_id"),
+]
+
+
+def populate(conn, n):
+    rnd = random.Random(1)
+    statuses = ["done"] * 90 + ["canceled"] * 8 + ["pending"] * 2
+    conn.executemany(
+        "INSERT INTO orders (user_id, device_id, status) VALUES (?, ?, ?)",
+        ((rnd.randrange(n // 10), "dev", rnd.choice(statuses)) for _ in range(n))
+    )
+    conn.executemany(
+        "INSERT INTO subscribers (user_id, first_seen) VALUES (?, datetime('now', ?))",
+        ((uid, f"-{rnd.randrange(10**6)} seconds") for uid in range(n // 10))
+    )
+    conn.commit()
+
+
+def timed(conn, sql, params, repeat=20):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        conn.execute(sql, params).fetchall()
+    return (time.perf_counter() - t0) / repeat * 1000
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(Path(tmp) / "bench.db")
+        migrate(conn, target=1)
+        t0 = time.perf_counter()
+        populate(conn, n)
+        print(f"populated {n} orders in {time.perf_counter() - t0:.1f}s")
+
+        before = {label: timed(conn, sql, params, 3) for label, sql, params, _ in QUERIES}
+        t0 = time.perf_counter()
+        migrate(conn, target=2)
+        print(f"migration 2 (indexes) took {time.perf_counter() - t0:.1f}s")
+        t0 = time.perf_counter()
+        version = migrate(conn)
+        print(f"migrations 3-{version} took {time.perf_counter() - t0:.1f}s")
+        t0 = time.perf_counter()
+        analyze(conn)
+        print(f"analyze took {time.perf_counter() - t0:.2f}s")
+
+        for label, sql, params, index in QUERIES:
+            plan = explain(conn, sql, params)
+            assert index in plan, f"{label}: expected {index}, got: {plan}"
+            after = timed(conn, sql, params)
+            print(f"{label:<18} before={before[label]:9.2f}ms  after={after:7.3f}ms  plan: {plan}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
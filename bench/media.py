@@ -0,0 +1,48 @@
+# قياس زمن إرسال صورة QR: رفع الملف في كل مرة (القديم) مقابل إعادة استخدام file_id
+# الرفع يُحاكى بسرعة bench._fakes.UPLOAD_BPS
+# التشغيل: python -m bench.media [عدد الطلبات]
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app import database, async_db, media
+from bench._fakes import FakeMessage
+
+QR_PATH = str(Path(__file__).resolve().parent.parent / "qr.png")
+
+
+async def run(label, send, n):
+    uploaded = 0
+    t0 = time.perf_counter()
+    for i in range(n):
+        message = FakeMessage(i)
+        await send(message)
+        uploaded += message.uploaded
+    dt = time.perf_counter() - t0
+    print(f"{label:<8} {dt / n * 1000:7.2f} ms/start  uploaded={uploaded / 1024:8.0f} KB")
+
+
+async def legacy(message):
+    with open(QR_PATH, "rb") as f:
+        await message.reply_photo(photo=f, caption="-")
+
+
+async def cached(message):
+    await media.reply_cached_photo(message, QR_PATH, caption="-")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = Path(tmp) / "bench.db"
+        database.init_db()
+        asyncio.run(run("before", legacy, n))
+        asyncio.run(run("after", cached, n))
+        async_db.shutdown()
+        database.close_conn()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+# قياس كلفة بناء الردود لكل تحديث: بناء الأزرار في كل استدعاء (القديم) مقابل كتالوج الردود
+# التشغيل: python -m bench.replies
+import timeit
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from app import replies
+from app.utils import final_report
+
+
+def legacy_team_keyboard(order_id):
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("🔑 إرسال كود التفعيل", callback_data=f"activate:{order_id}")],
+        [InlineKeyboardButton("❌ إلغاء الطلب", callback_data=f"cancel:{order_id}")]
+    ])
+
+
+def legacy_new_order_keyboard():
+    return InlineKeyboardMarkup([[InlineKeyboardButton("🔄 طلب جديد", callback_data="new_order")]])
+
+
+ORDER = {"device_id": "0f8fad5b-d9cb-469f-a165-70867728950e", "notify_msg": "123", "proof_file_id": "x",
+         "activation_code": "MGY4ZmFkNW", "status": "done"}
+
+CASES = [
+    ("team_keyboard (before)", lambda: legacy_team_keyboard(42)),
+    ("team_keyboard (after)", lambda: replies.team_keyboard(42)),
+    ("new_order_keyboard (before)", legacy_new_order_keyboard),
+    ("new_order_keyboard (after)", replies.new_order_keyboard),
+    ("start caption", lambda: replies.text("start_caption")),
+    ("final_report", lambda: final_report(42, ORDER)),
+]
+
+
+def main():
+    for label, fn in CASES:
+        n, total = timeit.Timer(fn).autorange()
+        print(f"{label:<30} {total / n * 1e6:8.2f} us/call")
+
+
+if __name__ == "__main__":
+    main()
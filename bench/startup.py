@@ -0,0 +1,104 @@
+# زمن بدء التشغيل البارد مقسمًا على مراحل الاستيراد والتهيئة، في عملية جديدة لكل تشغيل،
+# مع Bot API وهمي محلي بدل تيليغرام. يُشغَّل مرتين: قاعدة جديدة (ترحيل كامل) وقاعدة محدثة (بدون DDL)
+# التشغيل: python -m bench.startup
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+CHILD = r"""
+import asyncio, json, sys, time
+t0 = last = time.perf_counter()
+phases = []
+
+def phase(name):
+    global last
+    now = time.perf_counter()
+    phases.append((name, now - last))
+    last = now
+
+import app.config
+phase("config (+ .env)")
+from app import database
+phase("import app.database")
+database.init_db()
+phase("init_db")
+from app.bot import build_app
+phase("import app.bot (telegram stack)")
+application = build_app()
+phase("build_app")
+
+async def boot():
+    from bench.fake_bot_api import make_app
+    server = make_app(latency=float(sys.argv[1])).listen(int(sys.argv[2]), address="127.0.0.1")
+    global last
+    last = time.perf_counter()
+    await application.initialize()
+    phase("initialize (getMe)")
+    await application.post_init(application)
+    phase("post_init")
+    await application.bot.set_webhook("https://example.invalid/hook")
+    phase("set_webhook")
+    await application.post_stop(application)
+    await application.shutdown()
+    await application.post_shutdown(application)
+    server.stop()
+
+asyncio.run(boot())
+print(json.dumps({"phases": phases}))
+"""
+
+
+def run_child(env, importtime=False):
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", CHILD, env.pop("_LATENCY"), env.pop("_PORT")]
+    proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def top_imports(stderr, limit=15):
+    # الوقت التراكمي للوحدات في أول مستويين من شجرة الاستيراد (يشمل الاستيرادات المتأخرة أثناء التهيئة)
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= 1 and cumulative.strip().isdigit():
+            rows.append((("  " * depth) + name.strip(), int(cumulative)))
+    return sorted(rows, key=lambda kv: -kv[1])[:limit]
+
+
+def main():
+    latency = sys.argv[1] if len(sys.argv) > 1 else "0.05"
+    with tempfile.TemporaryDirectory() as tmp:
+        base = {
+            **os.environ, "DB_PATH": str(Path(tmp) / "startup.db"), "BOT_TOKEN": "1:bench", "MERCHANT_ID": "1",
+            "BOT_API_URL": "http://127.0.0.1:8091", "PING_PORT": "8092", "_LATENCY": latency, "_PORT": "8091",
+        }
+        runs = [
+            ("fresh db", {}),
+            ("migrated db", {}),
+            ("migrated db, FAST_START", {"FAST_START": "1"}),
+        ]
+        for label, extra in runs:
+            result, _ = run_child({**base, **extra})
+            total = sum(t for _, t in result["phases"])
+            print(f"\n{label}: total {total * 1000:.0f} ms")
+            for name, t in result["phases"]:
+                print(f"  {name:<34} {t * 1000:8.1f} ms")
+
+        _, stderr = run_child(dict(base), importtime=True)
+        print("\ntop-level imports (cumulative, -X importtime):")
+        for pkg, us in top_imports(stderr):
+            print(f"  {pkg:<40} {us / 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
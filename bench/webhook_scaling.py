@@ -0,0 +1,103 @@
+# قياس توسع وضع Webhook متعدد العمليات (app/server.py) مع عدد العمليات
+# يعيد إرسال تحديثات مسجلة (ملف JSONL) أو اصطناعية إلى الواجهة، والعمليات ترد عبر Bot API وهمي
+# التشغيل: python -m bench.webhook_scaling [عدد التحديثات] [ملف JSONL اختياري]
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+API_PORT = 18081
+WEBHOOK_PORT = 18443
+TOKEN = "123456:bench"
+WORKER_COUNTS = [1, 2, 4]
+
+
+def synthetic_updates(n):
+    for i in range(n):
+        uid = 1000 + i % 500
+        yield {
+            "update_id": i + 1,
+            "message": {
+                "message_id": i + 1, "date": int(time.time()), "text": "hello",
+                "chat": {"id": uid, "type": "private"},
+                "from": {"id": uid, "is_bot": False, "first_name": f"u{uid}"},
+            },
+        }
+
+
+def load_updates(path, n):
+    with open(path, encoding="utf-8") as f:
+        updates = [json.loads(line) for line in f if line.strip()]
+    return (updates * (n // len(updates) + 1))[:n]
+
+
+async def wait_for_port(port, timeout=30):
+    deadline = time.time() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.time() < deadline:
+            try:
+                await client.post(f"http://127.0.0.1:{port}/{TOKEN}", content=b"{}")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"port {port} did not open")
+
+
+async def replay(updates, expected):
+    api = f"http://127.0.0.1:{API_PORT}"
+    async with httpx.AsyncClient(timeout=30) as client:
+        await client.delete(f"{api}/stats")
+        sem = asyncio.Semaphore(64)
+
+        async def post(update):
+            async with sem:
+                await client.post(f"http://127.0.0.1:{WEBHOOK_PORT}/{TOKEN}", json=update)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(post(u) for u in updates))
+        # الانتظار حتى يرد البوت على كل التحديثات (أو يتوقف عن الرد)
+        while True:
+            stats = (await client.get(f"{api}/stats")).json()
+            sent = stats["calls"].get("sendMessage", 0)
+            if sent >= expected or (sent and time.time() - stats["last_call"] > 2):
+                break
+            await asyncio.sleep(0.05)
+        return sent, time.perf_counter() - t0
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    updates = load_updates(sys.argv[2], n) if len(sys.argv) > 2 else list(synthetic_updates(n))
+    api = subprocess.Popen([sys.executable, "-m", "bench.fake_bot_api", str(API_PORT), "0.02"])
+    try:
+        for workers in WORKER_COUNTS:
+            with tempfile.TemporaryDirectory() as tmp:
+                env = dict(os.environ, BOT_TOKEN=TOKEN, BOT_API_URL=f"http://127.0.0.1:{API_PORT}",
+                           DB_PATH=os.path.join(tmp, "bench.db"), MERCHANT_ID="1")
+                server = subprocess.Popen(
+                    [sys.executable, "-c",
+                     "import logging; logging.basicConfig(level=logging.WARNING);"
+                     "from app.database import init_db; init_db();"
+                     f"from app.server import serve; serve({workers}, '127.0.0.1', {WEBHOOK_PORT}, '{TOKEN}')"],
+                    env=env,
+                )
+                try:
+                    asyncio.run(wait_for_port(WEBHOOK_PORT))
+                    time.sleep(1 + workers)  # تهيئة العمليات
+                    sent, dt = asyncio.run(replay(updates, len(updates)))
+                    print(f"workers={workers}  updates={len(updates)}  replies={sent}  {sent / dt:7.0f} updates/s")
+                finally:
+                    server.send_signal(signal.SIGTERM)
+                    server.wait(60)
+    finally:
+        api.terminate()
+
+
+if __name__ == "__main__":
+    main()
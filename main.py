@@ -1,9 +1,5 @@
-import os
 import logging
-import threading
-from dotenv import load_dotenv
-from flask import Flask
-from app.bot import build_app
+from app.config import USE_POLLING, BOT_TOKEN, PORT, PUBLIC_URL, WEBHOOK_WORKERS, WEBHOOK_SECRET
 from app.database import init_db
 
 # إعداد اللوج
@@ -13,74 +9,39 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# تحميل المتغيرات من .env
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-dotenv_path = os.path.join(BASE_DIR, ".env")
-load_dotenv(dotenv_path=dotenv_path)
-
-# خادم Flask لمسارات الصحة
-flask_app = Flask(__name__)
-
-@flask_app.route("/")
-def home():
-    return "Service OK"
-
-@flask_app.route("/ping")
-def ping():
-    return "I am alive!"
-
-def run_flask():
-    # منفذ خدمة الصحة؛ يمكن تغييره عبر PING_PORT (افتراضي 8080)
-    port = int(os.environ.get("PING_PORT", 8080))
-    flask_app.run(host="0.0.0.0", port=port)
-
-def setup_keep_alive(app):
-    # مهمة دورية داخلية كل دقيقة
-    async def keep_alive(context):
-        # تنفيذ خفيف يحافظ على نشاط الحلقة
-        logger.info("Keep-Alive tick (every 60s)")
-        # إن رغبت: أرسل إشعارًا للتاجر نادرًا أو سجّل في DB
-        # await context.bot.send_chat_action(chat_id=MERCHANT_ID, action="typing")
-
-    # كل 60 ثانية
-    app.job_queue.run_repeating(keep_alive, interval=60, first=5)
+# الإعدادات (ومنها .env) تُقرأ مرة واحدة في app/config.py
+# مسارات الصحة (/ و /ping و /ready) تُخدم من حلقة البوت نفسها على PING_PORT (app/health.py)
+# المهام الدورية (الصيانة وملخص التاجر) تُسجَّل داخل build_app عبر app/maintenance.py
+# مكتبة telegram تُستورد داخل كل مسار تشغيل فقط (واجهة العمليات المتعددة لا تحتاج app.bot)
 
 if __name__ == "__main__":
-    # تهيئة قاعدة البيانات
+    # تهيئة قاعدة البيانات (بدون DDL إذا كان إصدار المخطط محدثًا)
     init_db()
 
-    # بناء تطبيق تيليغرام
-    app = build_app()
-
-    # تشغيل Flask في Thread منفصل
-    threading.Thread(target=run_flask, daemon=True).start()
-
-    # إضافة مهمة Keep-Alive كل دقيقة
-    setup_keep_alive(app)
-
     # اختيار نمط التشغيل (Polling محلي أو Webhook على الخادم)
-    use_polling = os.getenv("USE_POLLING", "0") == "1"
-    if use_polling:
+    if USE_POLLING:
+        from app.bot import build_app
+        app = build_app()
         print("🚀 تشغيل البوت عبر Polling...")
         app.run_polling(allowed_updates=["message", "callback_query"])
     else:
-        token = os.getenv("BOT_TOKEN")
-        port = int(os.environ.get("PORT", 5000))
-        base_url = os.environ.get("PUBLIC_URL")
-        if not base_url:
+        if not PUBLIC_URL:
             raise RuntimeError("PUBLIC_URL غير مضبوط")
 
-        webhook_url = f"{base_url}/{token}"
-        print(f"🚀 تشغيل البوت عبر Webhook… {webhook_url}")
-        app.run_webhook(
-            listen="0.0.0.0",
-            port=port,
-            url_path=token,
-            webhook_url=webhook_url,
-            allowed_updates=["message", "callback_query"],
-        )
-
-
-        
-
-# (venv) G:\All_my_project\rasidk-fawri>python main.py
\ No newline at end of file
+        webhook_url = f"{PUBLIC_URL}/{BOT_TOKEN}"
+        if WEBHOOK_WORKERS > 1:
+            # وضع الإنتاج: واجهة Webhook واحدة توزع التحديثات على عدة عمليات
+            from app.server import serve
+            print(f"🚀 تشغيل البوت عبر Webhook مع {WEBHOOK_WORKERS} عمليات… {webhook_url}")
+            serve(WEBHOOK_WORKERS, "0.0.0.0", PORT, BOT_TOKEN, webhook_url, WEBHOOK_SECRET)
+        else:
+            from app.bot import build_app
+            app = build_app()
+            print(f"🚀 تشغيل البوت عبر Webhook… {webhook_url}")
+            app.run_webhook(
+                listen="0.0.0.0",
+                port=PORT,
+                url_path=BOT_TOKEN,
+                webhook_url=webhook_url,
+                allowed_updates=["message", "callback_query"],
+            )